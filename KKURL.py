@@ -1,34 +1,514 @@
+import time
+# --startup-trace counts from here, so the (slow) Qt imports below are part of the trace
+PROCESS_STARTED = time.perf_counter()
 import sys
 import os
 import json
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QLineEdit, QHBoxLayout, QPushButton, QDockWidget, QListWidget, QCheckBox, QListWidgetItem, QInputDialog, QTextEdit
-from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineProfile, QWebEnginePage
-from PyQt5.QtCore import QUrl, QFile, QTextStream, QDir, pyqtSignal
+import re
+import random
+import argparse
+import glob
+import html
+import sqlite3
+import shutil
+import tempfile
+import threading
+import queue
+import math
+import zlib
+import subprocess
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from collections import OrderedDict, deque
+from urllib.parse import urlsplit
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QLineEdit, QHBoxLayout, QPushButton, QDockWidget, QListWidget, QCheckBox, QListWidgetItem, QInputDialog, QTextEdit, QTabBar, QStackedWidget, QLabel, QCompleter
+from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineProfile, QWebEnginePage, QWebEngineScript
+from PyQt5.QtCore import QUrl, QFile, QTextStream, QDir, pyqtSignal, QThread, QTimer, QFileSystemWatcher, QObject, Qt, QEventLoop, QBuffer, QIODevice, QUrlQuery, QStringListModel, pyqtSlot, QByteArray, QDataStream
+from PyQt5.QtWebEngineCore import QWebEngineUrlRequestInterceptor, QWebEngineUrlRequestInfo, QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob
+from PyQt5.QtWebChannel import QWebChannel
 from PyQt5.QtGui import QIcon
 
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# QWebEnginePage.LifecycleState only exists from Qt 5.14 on
+HAS_LIFECYCLE = hasattr(QWebEnginePage, "LifecycleState")
+
+DEFAULT_CONFIG = {
+    "home_url": "http://www.google.com",
+    "profile": "default",
+    "profile_dir": None,
+    "off_the_record": False,
+    "cache_type": "disk",
+    "cache_size_mb": 256,
+    "cookies": "persistent",
+    "clear_cache_older_than_days": 0,
+    "max_live_tabs": 10,
+    "memory_budget_mb": 0,
+    "content_blocking": True,
+    "filter_lists": [],
+    "prediction": "prerender",
+    "max_speculative_pages": 2,
+    "restore_session": True,
+    "fast_start": False,
+    "prewarm": False,
+    "startup_trace": None,
+    "quit_after_startup": False,
+}
+
+def data_dir():
+    """ Per-OS directory for profiles and settings. """
+    home = os.path.expanduser("~")
+    if sys.platform == "win32":
+        return os.path.join(os.getenv("LOCALAPPDATA") or os.path.join(home, "AppData", "Local"), "KKURL")
+    if sys.platform == "darwin":
+        return os.path.join(home, "Library", "Application Support", "KKURL")
+    return os.path.join(os.getenv("XDG_DATA_HOME") or os.path.join(home, ".local", "share"), "kkurl")
+
+def cache_dir():
+    """ Per-OS directory for the HTTP cache. """
+    home = os.path.expanduser("~")
+    if sys.platform == "win32":
+        return os.path.join(os.getenv("LOCALAPPDATA") or os.path.join(home, "AppData", "Local"), "KKURL", "Cache")
+    if sys.platform == "darwin":
+        return os.path.join(home, "Library", "Caches", "KKURL")
+    return os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.join(home, ".cache"), "kkurl")
+
+def load_config(path):
+    """ Read the JSON config file on top of DEFAULT_CONFIG. A missing file is not an error. """
+    config = dict(DEFAULT_CONFIG)
+    try:
+        with open(path, "r") as f:
+            config.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Ignoring config file {path}: {e}")
+    return config
+
+def parse_args(argv):
+    """ Build the browser config from the config file and command line. Returns (config, qt_argv). """
+    parser = argparse.ArgumentParser(description="KKURL BROWSER")
+    parser.add_argument("--config", default=os.path.join(data_dir(), "config.json"), help="path of the JSON config file")
+    parser.add_argument("--profile", help="named profile to use")
+    parser.add_argument("--incognito", action="store_true", default=None, help="use an off-the-record profile")
+    parser.add_argument("--cache-type", choices=sorted(ProfileManager.CACHE_TYPES), help="HTTP cache type")
+    parser.add_argument("--cache-size", type=int, metavar="MB", help="maximum HTTP cache size")
+    parser.add_argument("--cookies", choices=sorted(ProfileManager.COOKIE_POLICIES), help="cookie persistence policy")
+    parser.add_argument("--clear-cache-older-than", type=float, metavar="DAYS", help="delete cache entries older than DAYS on start")
+    parser.add_argument("--max-tabs", type=int, help="number of loaded tabs before background tabs get discarded")
+    parser.add_argument("--memory-budget", type=int, metavar="MB", help="memory budget before background tabs get discarded")
+    parser.add_argument("--prediction", choices=["prerender", "preconnect", "off"], help="warm up likely URL bar destinations")
+    parser.add_argument("--no-restore", dest="restore_session", action="store_false", default=None, help="start without restoring the last session")
+    parser.add_argument("--no-blocking", dest="content_blocking", action="store_false", default=None, help="disable the content blocker")
+    parser.add_argument("--filter-list", dest="filter_lists", action="append", metavar="PATH", help="extra EasyList-style filter file")
+    parser.add_argument("--fast-start", action="store_true", default=None, help="show the window with a local start page first, load the rest after the first paint")
+    parser.add_argument("--prewarm", action="store_true", default=None, help="start the first page's renderer while the window is built")
+    parser.add_argument("--startup-trace", nargs="?", const="-", metavar="FILE", help="write per-phase startup times as JSON (stdout without FILE)")
+    parser.add_argument("--quit-after-startup", action="store_true", default=None, help="close the browser once startup is done")
+    args, qt_argv = parser.parse_known_args(argv[1:])
+
+    config = load_config(args.config)
+    overrides = {
+        "profile": args.profile,
+        "off_the_record": args.incognito,
+        "cache_type": args.cache_type,
+        "cache_size_mb": args.cache_size,
+        "cookies": args.cookies,
+        "clear_cache_older_than_days": args.clear_cache_older_than,
+        "max_live_tabs": args.max_tabs,
+        "memory_budget_mb": args.memory_budget,
+        "content_blocking": args.content_blocking,
+        "prediction": args.prediction,
+        "restore_session": args.restore_session,
+        "fast_start": args.fast_start,
+        "prewarm": args.prewarm,
+        "startup_trace": args.startup_trace,
+        "quit_after_startup": args.quit_after_startup,
+    }
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    if args.filter_lists:
+        config["filter_lists"] = list(config["filter_lists"]) + args.filter_lists
+    return config, argv[:1] + qt_argv
+
+class StartupTrace(QObject):
+    """ Time spent in each startup phase, for --startup-trace.
+
+    mark(phase) closes a phase that started at the previous mark (or at process start).
+    finished is emitted once, with the report, when the browser is ready.
+    """
+    finished = pyqtSignal(dict)
+
+    def __init__(self, started=PROCESS_STARTED, parent=None):
+        super().__init__(parent)
+        self.started = self.last = started
+        self.phases = OrderedDict()
+        self.at = {}
+        self.done = False
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = round((now - self.last) * 1000, 2)
+        self.at[phase] = round((now - self.started) * 1000, 2)
+        self.last = now
+
+    def report(self):
+        return {
+            "phases_ms": dict(self.phases),
+            "first_paint_ms": self.at.get("first_paint"),
+            "ready_ms": round((self.last - self.started) * 1000, 2),
+        }
+
+    def finish(self):
+        if not self.done:
+            self.done = True
+            self.finished.emit(self.report())
+
+def write_startup_trace(path, report):
+    output = json.dumps(report, indent=4)
+    if path == "-":
+        print(output)
+    else:
+        with open(path, "w") as f:
+            f.write(output)
+
+class ProfileManager:
+    """ Creates the QWebEngineProfile for the configured named or off-the-record profile. """
+    CACHE_TYPES = {
+        "disk": QWebEngineProfile.DiskHttpCache,
+        "memory": QWebEngineProfile.MemoryHttpCache,
+        "none": QWebEngineProfile.NoCache,
+    }
+    COOKIE_POLICIES = {
+        "persistent": QWebEngineProfile.AllowPersistentCookies,
+        "force": QWebEngineProfile.ForcePersistentCookies,
+        "session": QWebEngineProfile.NoPersistentCookies,
+    }
+
+    def __init__(self, config):
+        self.config = config
+        self.name = config["profile"]
+        self.off_the_record = config["off_the_record"]
+        if config.get("profile_dir"):
+            # Everything in one place, e.g. a throwaway profile for benchmarks
+            self.storage_path = os.path.join(config["profile_dir"], "storage")
+            self.cache_path = os.path.join(config["profile_dir"], "cache")
+        else:
+            self.storage_path = os.path.join(data_dir(), "profiles", self.name)
+            self.cache_path = os.path.join(cache_dir(), "profiles", self.name)
+        self.profile = None
+
+    def open(self, parent=None):
+        """ Create (once) and return the configured profile. """
+        if self.profile is not None:
+            return self.profile
+        if self.off_the_record:
+            # Off-the-record profiles keep everything in memory
+            self.profile = QWebEngineProfile(parent)
+            self.profile.setHttpCacheType(QWebEngineProfile.MemoryHttpCache)
+        else:
+            os.makedirs(self.storage_path, exist_ok=True)
+            os.makedirs(self.cache_path, exist_ok=True)
+            # Chromium opens the cache with the profile, so prune it first
+            days = self.config["clear_cache_older_than_days"]
+            if days:
+                removed, freed = self.clear_cache_older_than(days)
+                print(f"Removed {removed} cache files ({freed // 1024} KB) older than {days} days")
+            self.profile = QWebEngineProfile(self.name, parent)
+            self.profile.setPersistentStoragePath(self.storage_path)
+            self.profile.setCachePath(self.cache_path)
+            self.profile.setHttpCacheType(self.CACHE_TYPES.get(self.config["cache_type"], QWebEngineProfile.DiskHttpCache))
+            self.profile.setPersistentCookiesPolicy(self.COOKIE_POLICIES.get(self.config["cookies"], QWebEngineProfile.AllowPersistentCookies))
+        # 0 lets QtWebEngine pick the size itself
+        self.profile.setHttpCacheMaximumSize(int(self.config["cache_size_mb"]) * 1024 * 1024)
+        return self.profile
+
+    def clear_cache_older_than(self, days):
+        """ Delete cache files not modified in the last days. Returns (files, bytes) removed. """
+        cutoff = time.time() - days * 86400
+        removed = freed = 0
+        for root, dirs, files in os.walk(self.cache_path):
+            for filename in files:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                    if stat.st_mtime < cutoff:
+                        os.remove(path)
+                        removed += 1
+                        freed += stat.st_size
+                except OSError:
+                    continue
+        return removed, freed
+
+class ScriptCache:
+    """ In-memory cache of extension script sources, keyed by path and mtime. """
+    def __init__(self):
+        self.entries = {}
+
+    def read(self, path):
+        """ Return the source of path, only touching the disk again when the file changed. """
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self.entries.pop(path, None)
+            return None
+        entry = self.entries.get(path)
+        if entry is None or entry[0] != mtime:
+            with open(path, "r") as script_file:
+                entry = (mtime, script_file.read())
+            self.entries[path] = entry
+        return entry[1]
+
+def extension_script(name, source):
+    """ Wrap extension source so it sees its own kkurl.runtime messaging API. """
+    return f"(function(kkurl) {{\n{source}\n}})({{runtime: window.__kkurl.runtime({json.dumps(name)})}});"
+
+class ScriptInjector:
+    """ Builds extension content scripts once as QWebEngineScripts.
+
+    Content scripts are kept per page and are swapped in by apply() according to the
+    URL match index. Background scripts run in their own page, see BackgroundHost.
+    """
+    RUN_AT = {
+        "document_start": QWebEngineScript.DocumentCreation,
+        "document_end": QWebEngineScript.DocumentReady,
+        "document_idle": QWebEngineScript.Deferred,
+    }
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.content = {}
+        self.applied = {}
+
+    def build_scripts(self, extension):
+        """ Build (but do not register) the QWebEngineScripts for an extension. """
+        content_scripts = extension.manifest.get("content_scripts") or [{}]
+        run_at = content_scripts[0].get("run_at", "document_idle")
+        source = self.cache.read(extension.content_script)
+        if source is None:
+            return {}
+        script = QWebEngineScript()
+        script.setName(f"kkurl-ext:{extension.name}:content")
+        script.setSourceCode(extension_script(extension.name, source))
+        script.setInjectionPoint(self.RUN_AT.get(run_at, QWebEngineScript.Deferred))
+        script.setWorldId(QWebEngineScript.ApplicationWorld)
+        script.setRunsOnSubFrames(False)
+        return {"content": script}
+
+    def register(self, extension):
+        """ (Re)register an extension's scripts and return them. """
+        pages = [page for page, names in self.applied.items() if extension.name in names]
+        self.unregister(extension)
+        scripts = self.build_scripts(extension)
+        if "content" in scripts:
+            self.content[extension.name] = scripts["content"]
+        # Pages that already carried the old content script get the new one
+        for page in pages:
+            self.apply(page, self.applied.get(page, frozenset()) | {extension.name})
+        return list(scripts.values())
+
+    def unregister(self, extension):
+        for page, names in list(self.applied.items()):
+            if extension.name in names:
+                self.apply(page, names - {extension.name})
+        self.content.pop(extension.name, None)
+
+    def apply(self, page, names):
+        """ Make the page's content scripts match exactly the given extension names. """
+        names = frozenset(name for name in names if name in self.content)
+        current = self.applied.get(page, frozenset())
+        if names == current:
+            return
+        if page not in self.applied:
+            page.destroyed.connect(lambda _=None, page=page: self.applied.pop(page, None))
+        collection = page.scripts()
+        for name in current - names:
+            script = self.content.get(name)
+            if script is not None:
+                collection.remove(script)
+        for name in names - current:
+            collection.insert(self.content[name])
+        self.applied[page] = names
+
+    def forget(self, page):
+        """ Drop a page that is going away without removing its scripts one by one. """
+        self.applied.pop(page, None)
+
+class MatchPattern:
+    """ A compiled manifest match pattern: <all_urls> or scheme://host/path. """
+    SCHEMES = ("http", "https", "file", "ftp")
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        if pattern == "<all_urls>":
+            self.schemes = self.SCHEMES
+            self.host = "*"
+            self.subdomains = True
+            self.path = None
+            return
+
+        scheme, sep, rest = pattern.partition("://")
+        if not sep:
+            raise ValueError(f"Invalid match pattern: {pattern}")
+        if scheme == "*":
+            self.schemes = ("http", "https")
+        elif scheme in self.SCHEMES:
+            self.schemes = (scheme,)
+        else:
+            raise ValueError(f"Unsupported scheme in match pattern: {pattern}")
+
+        host, slash, path = rest.partition("/")
+        if not slash:
+            raise ValueError(f"Match pattern has no path: {pattern}")
+        host = host.lower()
+        self.subdomains = host == "*" or host.startswith("*.")
+        if host.startswith("*."):
+            host = host[2:]
+        if host != "*" and "*" in host:
+            raise ValueError(f"Wildcard must lead the host: {pattern}")
+        self.host = host
+
+        path = "/" + path
+        if path == "/*":
+            self.path = None
+        else:
+            self.path = re.compile(".*".join(re.escape(part) for part in path.split("*")), re.DOTALL)
+
+    def matches(self, scheme, path):
+        """ Check the parts the index does not already resolve (scheme and path). """
+        if scheme not in self.schemes:
+            return False
+        return self.path is None or self.path.fullmatch(path) is not None
+
+class URLMatchIndex:
+    """ Index of manifest match patterns keyed by a host-suffix trie.
+
+    Looking up a URL walks its host labels from the TLD down and only checks the
+    path matchers of the patterns found on the way, so the cost depends on the
+    number of candidate patterns for that host, not on how many are installed.
+    """
+    EXACT = "\0exact"
+    SUBDOMAINS = "\0sub"
+
+    def __init__(self):
+        self.entries = {}
+        self.dirty = False
+        self.any_host = []
+        # Patterns for URLs without a host, e.g. file:///*
+        self.no_host = []
+        self.trie = {}
+
+    def add(self, key, matches, exclude_matches=()):
+        """ Index one content_scripts group under key. Invalid patterns are skipped. """
+        patterns = []
+        for pattern, exclude in [(p, False) for p in matches] + [(p, True) for p in exclude_matches]:
+            try:
+                patterns.append((MatchPattern(pattern), exclude))
+            except ValueError as e:
+                print(f"Ignoring match pattern for {key}: {e}")
+        self.entries[key] = patterns
+        if not self.dirty:
+            for compiled, exclude in patterns:
+                self.insert(key, compiled, exclude)
+
+    def add_extension(self, extension):
+        """ Index every content_scripts group of an extension. """
+        for i, group in enumerate(extension.manifest.get("content_scripts") or []):
+            self.add((extension.name, i), group.get("matches") or [], group.get("exclude_matches") or [])
+
+    def remove_extension(self, extension):
+        for key in [key for key in self.entries if key[0] == extension.name]:
+            del self.entries[key]
+            self.dirty = True
+
+    def insert(self, key, compiled, exclude):
+        if compiled.host == "*":
+            self.any_host.append((key, compiled, exclude))
+            return
+        if not compiled.host:
+            self.no_host.append((key, compiled, exclude))
+            return
+        node = self.trie
+        for label in reversed(compiled.host.split(".")):
+            node = node.setdefault(label, {})
+        node.setdefault(self.SUBDOMAINS if compiled.subdomains else self.EXACT, []).append((key, compiled, exclude))
+
+    def rebuild(self):
+        self.any_host = []
+        self.no_host = []
+        self.trie = {}
+        for key, patterns in self.entries.items():
+            for compiled, exclude in patterns:
+                self.insert(key, compiled, exclude)
+        self.dirty = False
+
+    def lookup(self, url):
+        """ Return the set of keys whose patterns match url (and are not excluded). """
+        if self.dirty:
+            self.rebuild()
+        parts = urlsplit(url)
+        scheme = parts.scheme
+        host = (parts.hostname or "").lower()
+        path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+
+        candidates = list(self.any_host)
+        if not host:
+            candidates.extend(self.no_host)
+        node = self.trie
+        for label in reversed(host.split(".")) if host else ():
+            node = node.get(label)
+            if node is None:
+                break
+            candidates.extend(node.get(self.SUBDOMAINS, ()))
+        else:
+            if node is not self.trie:
+                candidates.extend(node.get(self.EXACT, ()))
+
+        included = set()
+        excluded = set()
+        for key, compiled, exclude in candidates:
+            if compiled.matches(scheme, path):
+                (excluded if exclude else included).add(key)
+        return included - excluded
+
+    def lookup_names(self, url):
+        """ Names of the extensions with at least one content_scripts group matching url. """
+        return {key[0] for key in self.lookup(url)}
+
 class Extension:
     def __init__(self, name, path, manifest):
         self.name = name
         self.path = path
         self.manifest = manifest
         self.enabled = False
+        self.injector = None
+        self.host = None
         self.background_script = os.path.join(self.path, "background.js")
         self.content_script = os.path.join(self.path, "content.js")
 
     def enable(self, browser):
         if not self.enabled:
-            if os.path.exists(self.background_script):
-                with open(self.background_script, "r") as script_file:
-                    background_script = script_file.read()
-                browser.webview.page().runJavaScript(background_script)
-            if os.path.exists(self.content_script):
-                with open(self.content_script, "r") as script_file:
-                    content_script = script_file.read()
-                browser.webview.page().runJavaScript(content_script)
+            self.injector = browser.injector
+            self.host = browser.background_host
+            scripts = self.injector.register(self)
+            browser.match_index.add_extension(self)
+            self.host.start(self)
             self.enabled = True
+            # The content script applies from the next navigation on; run it once in the
+            # page that is already open so enabling takes effect immediately.
+            page = browser.webview.page()
+            if self.name in browser.update_content_scripts(page, page.url()):
+                page.runJavaScript(self.host.bridge_source, QWebEngineScript.ApplicationWorld)
+                for script in scripts:
+                    page.runJavaScript(script.sourceCode(), QWebEngineScript.ApplicationWorld)
             print(f"Enabled extension: {self.name}")
 
     def disable(self, browser):
+        if self.enabled:
+            browser.injector.unregister(self)
+            browser.match_index.remove_extension(self)
+            browser.background_host.stop(self.name)
         self.enabled = False
         print(f"Disabled extension: {self.name}")
     
@@ -39,21 +519,1686 @@ class Extension:
         
         with open(self.content_script, 'w') as f:
             f.write(content_code)
+
+        # The new mtime invalidates the cached sources, so re-registering picks them up.
+        if self.enabled and self.injector is not None:
+            self.injector.register(self)
+            self.host.start(self)
         
         print(f"Updated extension {self.name} with new code.")
 
-class Browser(QMainWindow):
+BRIDGE_JS = """
+(function() {
+    if (window.__kkurl) return;
+    var queue = [], callbacks = {}, listeners = {}, nextId = 1, endpoint = null, scheduled = false;
+
+    // Everything queued during one task goes to Python as a single batch. A microtask
+    // rather than setTimeout, which hidden background pages would throttle.
+    function flush() {
+        scheduled = false;
+        if (endpoint === null || !queue.length) return;
+        var batch = queue;
+        queue = [];
+        endpoint.post(JSON.stringify(batch));
+    }
+
+    function enqueue(message) {
+        queue.push(message);
+        if (!scheduled) {
+            scheduled = true;
+            Promise.resolve().then(flush);
+        }
+    }
+
+    function receive(payload) {
+        JSON.parse(payload).forEach(function(message) {
+            if (message.reply !== undefined) {
+                var callback = callbacks[message.reply];
+                delete callbacks[message.reply];
+                if (callback) callback(message.data);
+                return;
+            }
+            (listeners[message.ext] || []).forEach(function(listener) {
+                listener(message.data, {from: message.from}, function(response) {
+                    enqueue({reply: message.id, to: message.from, ext: message.ext, data: response});
+                });
+            });
+        });
+    }
+
+    window.__kkurl = {
+        runtime: function(ext) {
+            return {
+                sendMessage: function(data, callback) {
+                    var id = nextId++;
+                    if (callback) callbacks[id] = callback;
+                    enqueue({id: id, ext: ext, data: data});
+                },
+                onMessage: {
+                    addListener: function(listener) {
+                        (listeners[ext] = listeners[ext] || []).push(listener);
+                    }
+                }
+            };
+        }
+    };
+
+    if (typeof qt === "undefined" || !qt.webChannelTransport) return;
+    new QWebChannel(qt.webChannelTransport, function(channel) {
+        endpoint = channel.objects.kkurl;
+        endpoint.deliver.connect(receive);
+        endpoint.hello();
+        flush();
+    });
+})();
+"""
+
+class BridgeEndpoint(QObject):
+    """ One page's end of the extension message bridge, published as 'kkurl' on its web channel.
+
+    Messages for the page are queued and delivered as one JSON batch per event-loop tick.
+    """
+    MAX_QUEUED = 1000
+
+    deliver = pyqtSignal(str)
+
+    def __init__(self, host, endpoint_id, extension=None, parent=None):
+        super().__init__(parent)
+        self.host = host
+        self.id = endpoint_id
+        self.extension = extension
+        self.connected = False
+        self.outbox = []
+        self.scheduled = False
+
+    @pyqtSlot()
+    def hello(self):
+        self.connected = True
+        self.host.endpoint_connected(self)
+        self.schedule()
+
+    @pyqtSlot(str)
+    def post(self, payload):
+        try:
+            messages = json.loads(payload)
+        except ValueError:
+            return
+        self.host.receive(self, messages)
+
+    def reset(self):
+        """ The page started a new document; hold messages until its bridge reconnects. """
+        self.connected = False
+
+    def send(self, message):
+        self.outbox.append(message)
+        if len(self.outbox) > self.MAX_QUEUED:
+            del self.outbox[:-self.MAX_QUEUED]
+        self.schedule()
+
+    def schedule(self):
+        if self.connected and self.outbox and not self.scheduled:
+            self.scheduled = True
+            QTimer.singleShot(0, self.flush)
+
+    def flush(self):
+        self.scheduled = False
+        if not self.connected or not self.outbox:
+            return
+        batch, self.outbox = self.outbox, []
+        self.host.stats["batches_out"] += 1
+        self.deliver.emit(json.dumps(batch))
+
+class BackgroundHost(QObject):
+    """ Runs each enabled extension's background.js in its own hidden page.
+
+    The pages outlive tab navigations. Content scripts, background pages and Python
+    talk through BridgeEndpoints: content scripts reach their extension's background
+    page, a background page reaches the content scripts of its extension in every tab,
+    and send() lets Python message a background page and time the round trip.
+    """
+    # Python's own endpoint id in message routing
+    PYTHON = 0
+
+    backgroundReady = pyqtSignal(str)
+
+    def __init__(self, profile, cache, parent=None):
+        super().__init__(parent)
+        self.profile = profile
+        self.cache = cache
+        self.backgrounds = {}
+        self.endpoints = {}
+        self.next_id = 1
+        self.pending = {}
+        self.latencies = deque(maxlen=1000)
+        self.stats = {"messages": 0, "batches_in": 0, "batches_out": 0}
+        self.bridge_source = self.read_qwebchannel_js() + BRIDGE_JS
+        self.bridge_script = None
+
+    @staticmethod
+    def read_qwebchannel_js():
+        qwebchannel = QFile(":/qtwebchannel/qwebchannel.js")
+        if not qwebchannel.open(QIODevice.ReadOnly):
+            return ""
+        source = bytes(qwebchannel.readAll()).decode("utf-8")
+        qwebchannel.close()
+        return source
+
+    def install_bridge(self):
+        """ Put the messaging runtime into every page once the first extension needs it. """
+        if self.bridge_script is not None:
+            return
+        script = QWebEngineScript()
+        script.setName("kkurl-bridge")
+        script.setSourceCode(self.bridge_source)
+        # Profile scripts run before the page's own, so the content scripts find it
+        script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+        script.setWorldId(QWebEngineScript.ApplicationWorld)
+        script.setRunsOnSubFrames(False)
+        self.profile.scripts().insert(script)
+        self.bridge_script = script
+
+    def connect_page(self, page, extension=None):
+        """ Give a page its endpoint on a web channel in the extensions' world. """
+        channel = QWebChannel(page)
+        endpoint = BridgeEndpoint(self, self.next_id, extension, channel)
+        self.next_id += 1
+        channel.registerObject("kkurl", endpoint)
+        page.setWebChannel(channel, QWebEngineScript.ApplicationWorld)
+        page.loadStarted.connect(endpoint.reset)
+        self.endpoints[endpoint.id] = endpoint
+        page.destroyed.connect(lambda _=None, endpoint_id=endpoint.id: self.endpoints.pop(endpoint_id, None))
+        return endpoint
+
+    def disconnect_page(self, page):
+        """ Stop routing messages to a page that is going away. """
+        channel = page.webChannel()
+        for endpoint_id, endpoint in list(self.endpoints.items()):
+            if endpoint.parent() is channel:
+                del self.endpoints[endpoint_id]
+
+    def start(self, extension):
+        """ (Re)start the background page of an extension that has a background.js. """
+        self.stop(extension.name)
+        source = self.cache.read(extension.background_script)
+        if source is None:
+            return None
+        self.install_bridge()
+        page = QWebEnginePage(self.profile, self)
+        endpoint = self.connect_page(page, extension.name)
+        script = QWebEngineScript()
+        script.setName(f"kkurl-ext:{extension.name}:background")
+        script.setSourceCode(extension_script(extension.name, source))
+        script.setInjectionPoint(QWebEngineScript.DocumentReady)
+        script.setWorldId(QWebEngineScript.ApplicationWorld)
+        page.scripts().insert(script)
+        page.setHtml(f"<!DOCTYPE html><title>{html.escape(extension.name)}</title>", QUrl("kkurl://background/"))
+        self.backgrounds[extension.name] = (page, endpoint)
+        return page
+
+    def stop(self, name):
+        background = self.backgrounds.pop(name, None)
+        if background is not None:
+            page, endpoint = background
+            self.endpoints.pop(endpoint.id, None)
+            page.deleteLater()
+
+    def stop_all(self):
+        for name in list(self.backgrounds):
+            self.stop(name)
+
+    def endpoint_connected(self, endpoint):
+        if endpoint.extension is not None:
+            self.backgroundReady.emit(endpoint.extension)
+
+    def receive(self, endpoint, messages):
+        self.stats["batches_in"] += 1
+        for message in messages:
+            if not isinstance(message, dict):
+                continue
+            self.stats["messages"] += 1
+            message["from"] = endpoint.id
+            if endpoint.extension is not None:
+                # A background page only speaks for its own extension
+                message["ext"] = endpoint.extension
+            if "reply" in message:
+                if message.get("to") == self.PYTHON:
+                    self.resolve(message)
+                else:
+                    target = self.endpoints.get(message.get("to"))
+                    if target is not None:
+                        target.send(message)
+            elif endpoint.extension is None:
+                # Content script -> its extension's background page
+                background = self.backgrounds.get(message.get("ext"))
+                if background is not None:
+                    background[1].send(message)
+                elif "id" in message:
+                    endpoint.send({"reply": message["id"], "data": None})
+            else:
+                # Background page -> the content scripts of its extension in every tab
+                for target in self.endpoints.values():
+                    if target.extension is None:
+                        target.send(message)
+
+    def send(self, name, data, callback=None):
+        """ Message an extension's background page from Python. False if it is not running. """
+        background = self.backgrounds.get(name)
+        if background is None:
+            return False
+        message_id = self.next_id
+        self.next_id += 1
+        self.pending[message_id] = (callback, time.perf_counter())
+        background[1].send({"id": message_id, "ext": name, "from": self.PYTHON, "data": data})
+        return True
+
+    def resolve(self, message):
+        callback, sent = self.pending.pop(message.get("reply"), (None, None))
+        if sent is None:
+            return
+        self.latencies.append((time.perf_counter() - sent) * 1000)
+        if callback is not None:
+            callback(message.get("data"))
+
+    def latency_summary(self):
+        timings = sorted(self.latencies)
+        if not timings:
+            return None
+        return {"count": len(timings), "p50_ms": round(percentile(timings, 50), 3),
+                "p95_ms": round(percentile(timings, 95), 3), "max_ms": round(timings[-1], 3)}
+
+class ManifestIndex:
+    """ Parsed manifests persisted next to the extensions, keyed by folder name and mtime. """
+    FILENAME = ".manifest-index.json"
+
+    def __init__(self, extensions_dir):
+        self.path = os.path.join(extensions_dir, self.FILENAME)
+        self.entries = {}
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        return self
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+class ExtensionScanner(QThread):
+    """ Discovers extensions off the GUI thread and reports only what changed.
+
+    known maps extension names to the manifest mtime the GUI currently has, so
+    unchanged extensions are neither re-parsed nor re-sent.
+    """
+    BATCH_SIZE = 50
+
+    # [(name, path, manifest, mtime)] added or refreshed extensions
+    batchReady = pyqtSignal(list)
+    # [name] extensions whose folder or manifest went away
+    removed = pyqtSignal(list)
+
+    def __init__(self, extensions_dir, known, parent=None):
+        super().__init__(parent)
+        self.extensions_dir = extensions_dir
+        self.known = dict(known)
+
+    def run(self):
+        index = ManifestIndex(self.extensions_dir).load()
+        entries = {}
+        batch = []
+        try:
+            dir_entries = list(os.scandir(self.extensions_dir))
+        except OSError:
+            dir_entries = []
+        for entry in dir_entries:
+            if not entry.is_dir():
+                continue
+            manifest_path = os.path.join(entry.path, "manifest.json")
+            try:
+                mtime = os.stat(manifest_path).st_mtime_ns
+            except OSError:
+                continue
+            cached = index.entries.get(entry.name)
+            if cached is not None and cached["mtime"] == mtime and cached["path"] == entry.path:
+                manifest = cached["manifest"]
+            else:
+                try:
+                    with open(manifest_path, "r") as manifest_file:
+                        manifest = json.load(manifest_file)
+                except (OSError, ValueError) as e:
+                    print(f"Skipping extension {entry.name}: {e}")
+                    continue
+            entries[entry.name] = {"path": entry.path, "mtime": mtime, "manifest": manifest}
+            if self.known.get(entry.name) != mtime:
+                batch.append((entry.name, entry.path, manifest, mtime))
+                if len(batch) >= self.BATCH_SIZE:
+                    self.batchReady.emit(batch)
+                    batch = []
+        if batch:
+            self.batchReady.emit(batch)
+
+        gone = [name for name in self.known if name not in entries]
+        if gone:
+            self.removed.emit(gone)
+
+        if entries != index.entries:
+            index.entries = entries
+            try:
+                index.save()
+            except OSError as e:
+                print(f"Could not save manifest index: {e}")
+
+TOKEN_RE = re.compile(r"[a-z0-9%]{3,}")
+
+def parent_domains(host):
+    """ host itself followed by each parent domain: a.b.c -> a.b.c, b.c, c """
+    labels = host.split(".")
+    return [".".join(labels[i:]) for i in range(len(labels))]
+
+def site_of(host):
+    """ Rough registrable domain (last two labels), used for third-party checks. """
+    return ".".join(host.rsplit(".", 2)[-2:])
+
+class FilterRule:
+    """ One compiled non-domain filter rule. """
+    __slots__ = ("text", "substring", "regex", "third_party", "domains", "not_domains", "types")
+
+    def __init__(self, text):
+        self.text = text
+        self.substring = None
+        self.regex = None
+        self.third_party = None
+        self.domains = ()
+        self.not_domains = ()
+        self.types = None
+
+    def matches(self, url, host, first_party_host, resource_type):
+        if self.third_party is not None and first_party_host:
+            if (site_of(host) != site_of(first_party_host)) != self.third_party:
+                return False
+        if self.types is not None and resource_type not in self.types:
+            return False
+        if self.domains or self.not_domains:
+            parents = parent_domains(first_party_host) if first_party_host else []
+            if any(domain in self.not_domains for domain in parents):
+                return False
+            if self.domains and not any(domain in self.domains for domain in parents):
+                return False
+        if self.substring is not None:
+            return self.substring in url
+        return self.regex.search(url) is not None
+
+class FilterEngine:
+    """ EasyList-style network filters compiled for fast per-request decisions.
+
+    Plain ||domain^ rules go into hashed domain sets that are checked by walking the
+    request host's parent domains. Everything else is indexed by one token that any
+    matching URL must contain, so a request only tests the few rules sharing one of
+    its tokens instead of the whole list.
+    """
+    TYPE_OPTIONS = {"script", "image", "stylesheet", "xmlhttprequest", "subdocument", "object",
+                    "media", "font", "ping", "websocket", "other"}
+    IGNORED_OPTIONS = {"important", "all"}
+    DOMAIN_RULE_RE = re.compile(r"^\|\|([a-z0-9.-]+)\^?$")
+    # Tokens found in nearly every URL make useless index keys
+    COMMON_TOKENS = {"http", "https", "www", "com", "net", "org", "html", "php"}
+
     def __init__(self):
+        self.blocked_domains = set()
+        self.allowed_domains = set()
+        self.block_tokens = {}
+        self.allow_tokens = {}
+        self.block_untokenized = []
+        self.allow_untokenized = []
+        self.rule_count = 0
+        self.skipped = 0
+
+    def load_file(self, path):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                self.add_rule(line)
+        return self
+
+    def add_rule(self, line):
+        """ Compile one filter line. Comments, cosmetic and unsupported rules are skipped. """
+        line = line.strip()
+        if not line or line.startswith(("!", "[")) or "##" in line or "#@#" in line or "#?#" in line or "#$#" in line:
+            return False
+        exception = line.startswith("@@")
+        if exception:
+            line = line[2:]
+
+        pattern, options = line, ""
+        if "$" in line:
+            pattern, _, options = line.rpartition("$")
+            if "/" in options and not options.startswith("domain="):
+                pattern, options = line, ""
+        if not self.is_regex(pattern):
+            pattern = pattern.lower()
+
+        rule = FilterRule(("@@" if exception else "") + line)
+        for option in filter(None, options.lower().split(",")):
+            if option == "third-party":
+                rule.third_party = True
+            elif option in ("~third-party", "first-party"):
+                rule.third_party = False
+            elif option.startswith("domain="):
+                domains = option[7:].split("|")
+                rule.domains = frozenset(d for d in domains if not d.startswith("~"))
+                rule.not_domains = frozenset(d[1:] for d in domains if d.startswith("~"))
+            elif option in self.TYPE_OPTIONS:
+                rule.types = (rule.types or set()) | {option}
+            elif option.startswith("~") and option[1:] in self.TYPE_OPTIONS:
+                rule.types = (rule.types if rule.types is not None else set(self.TYPE_OPTIONS)) - {option[1:]}
+            elif option not in self.IGNORED_OPTIONS:
+                # popup, csp, redirect, document, ... are not network blocking rules we can apply
+                self.skipped += 1
+                return False
+
+        if not options:
+            match = self.DOMAIN_RULE_RE.match(pattern)
+            if match:
+                (self.allowed_domains if exception else self.blocked_domains).add(match.group(1))
+                self.rule_count += 1
+                return True
+
+        if not self.compile(rule, pattern):
+            self.skipped += 1
+            return False
+        token = self.pick_token(pattern, self.allow_tokens if exception else self.block_tokens)
+        if token is None:
+            (self.allow_untokenized if exception else self.block_untokenized).append(rule)
+        else:
+            (self.allow_tokens if exception else self.block_tokens).setdefault(token, []).append(rule)
+        self.rule_count += 1
+        return True
+
+    @staticmethod
+    def is_regex(pattern):
+        return len(pattern) > 2 and pattern.startswith("/") and pattern.endswith("/")
+
+    def compile(self, rule, pattern):
+        if self.is_regex(pattern):
+            # Regex bodies keep their case: lowercasing would turn \W into \w, \D into \d, ...
+            try:
+                rule.regex = re.compile(pattern[1:-1], re.IGNORECASE)
+            except re.error:
+                return False
+            return True
+
+        host_anchor = pattern.startswith("||")
+        start_anchor = not host_anchor and pattern.startswith("|")
+        end_anchor = pattern.endswith("|") and len(pattern) > 1
+        body = pattern[2 if host_anchor else 1 if start_anchor else 0:]
+        if end_anchor:
+            body = body[:-1]
+        body = body.strip("*") if not (host_anchor or start_anchor or end_anchor) else body
+        if not body:
+            return False
+
+        if not (host_anchor or start_anchor or end_anchor) and "*" not in body and "^" not in body:
+            rule.substring = body
+            return True
+
+        parts = []
+        for ch in body:
+            if ch == "*":
+                parts.append(".*")
+            elif ch == "^":
+                parts.append(r"(?:[^\w.%-]|$)")
+            else:
+                parts.append(re.escape(ch))
+        regex = "".join(parts)
+        if host_anchor:
+            regex = r"^[a-z][a-z0-9+.-]*://(?:[^/?#]*\.)?" + regex
+        elif start_anchor:
+            regex = "^" + regex
+        if end_anchor:
+            regex += "$"
+        rule.regex = re.compile(regex)
+        return True
+
+    def pick_token(self, pattern, index=None):
+        """ A token that appears as a whole URL token in every match of pattern.
+
+        Among the candidates the one with the fewest rules already indexed under it
+        wins (then the longest), which keeps the per-token rule lists short.
+        """
+        if self.is_regex(pattern):
+            return None
+        anchored_start = pattern.startswith("|")
+        body = pattern.lstrip("|")
+        anchored_end = body.endswith("|")
+        body = body.rstrip("|")
+        best = None
+        for match in TOKEN_RE.finditer(body):
+            start, end = match.span()
+            left_ok = body[start - 1] != "*" if start > 0 else anchored_start
+            right_ok = body[end] != "*" if end < len(body) else anchored_end
+            if not (left_ok and right_ok):
+                continue
+            token = match.group()
+            score = (token not in self.COMMON_TOKENS, -len(index.get(token, ())) if index else 0, len(token))
+            if best is None or score > best[0]:
+                best = (score, token)
+        return best[1] if best is not None else None
+
+    def match_rules(self, tokens_index, untokenized, url, tokens, host, first_party_host, resource_type):
+        for token in tokens:
+            for rule in tokens_index.get(token, ()):
+                if rule.matches(url, host, first_party_host, resource_type):
+                    return rule
+        for rule in untokenized:
+            if rule.matches(url, host, first_party_host, resource_type):
+                return rule
+        return None
+
+    def should_block(self, url, host, first_party_host="", resource_type=None):
+        """ Decide whether a request to url (host) made by first_party_host is blocked. """
+        url = url.lower()
+        host = host.lower()
+        first_party_host = first_party_host.lower()
+        parents = parent_domains(host)
+        tokens = set(TOKEN_RE.findall(url))
+
+        blocked = any(domain in self.blocked_domains for domain in parents) or \
+            self.match_rules(self.block_tokens, self.block_untokenized, url, tokens, host, first_party_host, resource_type) is not None
+        if not blocked:
+            return False
+        if any(domain in self.allowed_domains for domain in parents):
+            return False
+        return self.match_rules(self.allow_tokens, self.allow_untokenized, url, tokens, host, first_party_host, resource_type) is None
+
+class FilterLoader(QThread):
+    """ Compiles the filter lists off the GUI thread. """
+    loaded = pyqtSignal(object)
+
+    def __init__(self, paths, parent=None):
+        super().__init__(parent)
+        self.paths = paths
+
+    def run(self):
+        engine = FilterEngine()
+        for path in self.paths:
+            try:
+                engine.load_file(path)
+            except OSError as e:
+                print(f"Could not load filter list {path}: {e}")
+        self.loaded.emit(engine)
+
+class ContentBlocker(QWebEngineUrlRequestInterceptor):
+    """ Blocks requests matched by the filter engine and reports them per first-party URL. """
+    RESOURCE_TYPES = {
+        QWebEngineUrlRequestInfo.ResourceTypeScript: "script",
+        QWebEngineUrlRequestInfo.ResourceTypeImage: "image",
+        QWebEngineUrlRequestInfo.ResourceTypeStylesheet: "stylesheet",
+        QWebEngineUrlRequestInfo.ResourceTypeXhr: "xmlhttprequest",
+        QWebEngineUrlRequestInfo.ResourceTypeSubFrame: "subdocument",
+        QWebEngineUrlRequestInfo.ResourceTypeObject: "object",
+        QWebEngineUrlRequestInfo.ResourceTypeMedia: "media",
+        QWebEngineUrlRequestInfo.ResourceTypeFontResource: "font",
+        QWebEngineUrlRequestInfo.ResourceTypePing: "ping",
+    }
+    # First-party URL of the page a request was blocked for
+    blocked = pyqtSignal(str)
+
+    def __init__(self, engine, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+
+    def interceptRequest(self, info):
+        if info.resourceType() == QWebEngineUrlRequestInfo.ResourceTypeMainFrame:
+            return
+        url = info.requestUrl()
+        if url.scheme() not in ("http", "https", "ws", "wss"):
+            return
+        first_party = info.firstPartyUrl()
+        resource_type = self.RESOURCE_TYPES.get(info.resourceType(), "other")
+        if self.engine.should_block(url.toString(), url.host(), first_party.host(), resource_type):
+            info.block(True)
+            self.blocked.emit(first_party.toString())
+
+def percentile(sorted_values, q):
+    """ Nearest-rank percentile of an already sorted list. """
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))]
+
+class PerfStore:
+    """ SQLite store of page-load records, rotated to the newest max_rows rows. """
+    def __init__(self, path, max_rows=50000):
+        self.path = path
+        self.max_rows = max_rows
+        self.inserts = 0
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS loads(
+            id INTEGER PRIMARY KEY, ts REAL, url TEXT, origin TEXT, ok INTEGER,
+            load_ms REAL, first_progress_ms REAL, ttfb_ms REAL, dom_content_loaded_ms REAL,
+            load_event_ms REAL, fcp_ms REAL, resources INTEGER, transfer_bytes INTEGER)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS loads_origin_ts ON loads(origin, ts)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS loads_ts ON loads(ts)")
+        self.db.commit()
+
+    def add(self, record):
+        self.db.execute(
+            "INSERT INTO loads(ts, url, origin, ok, load_ms, first_progress_ms, ttfb_ms, dom_content_loaded_ms, "
+            "load_event_ms, fcp_ms, resources, transfer_bytes) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+            (record["ts"], record["url"], record["origin"], int(record["ok"]), record["load_ms"],
+             record.get("first_progress_ms"), record.get("ttfb_ms"), record.get("dom_content_loaded_ms"),
+             record.get("load_event_ms"), record.get("fcp_ms"), record.get("resources"), record.get("transfer_bytes")))
+        self.inserts += 1
+        if self.inserts % 500 == 0:
+            self.db.execute("DELETE FROM loads WHERE id <= (SELECT MAX(id) FROM loads) - ?", (self.max_rows,))
+        self.db.commit()
+
+    def summary(self, days=7):
+        """ p50/p95 of the main timings per origin over the last days. """
+        since = time.time() - days * 86400
+        rows = self.db.execute(
+            "SELECT origin, load_ms, ttfb_ms, fcp_ms FROM loads WHERE ts >= ? AND ok = 1 ORDER BY origin", (since,)).fetchall()
+        by_origin = {}
+        for origin, load_ms, ttfb_ms, fcp_ms in rows:
+            values = by_origin.setdefault(origin, ([], [], []))
+            for bucket, value in zip(values, (load_ms, ttfb_ms, fcp_ms)):
+                if value is not None:
+                    bucket.append(value)
+        summary = []
+        for origin, buckets in by_origin.items():
+            entry = {"origin": origin, "loads": len(buckets[0])}
+            for name, values in zip(("load", "ttfb", "fcp"), buckets):
+                values.sort()
+                entry[f"{name}_p50"] = percentile(values, 50)
+                entry[f"{name}_p95"] = percentile(values, 95)
+            summary.append(entry)
+        summary.sort(key=lambda entry: -entry["loads"])
+        return summary
+
+    def recent(self, limit=20):
+        return self.db.execute(
+            "SELECT ts, url, ok, load_ms, ttfb_ms, fcp_ms, resources, transfer_bytes FROM loads ORDER BY id DESC LIMIT ?",
+            (limit,)).fetchall()
+
+class PerfRecorder(QObject):
+    """ Times every navigation of the attached views and stores one record per page load. """
+    # Runs in the application world so pages cannot tamper with it
+    COLLECT_JS = """
+    (function() {
+        var nav = performance.getEntriesByType('navigation')[0];
+        var paint = {};
+        performance.getEntriesByType('paint').forEach(function(entry) { paint[entry.name] = entry.startTime; });
+        var resources = performance.getEntriesByType('resource');
+        var bytes = (nav && nav.transferSize) || 0;
+        resources.forEach(function(entry) { bytes += entry.transferSize || 0; });
+        return JSON.stringify({
+            ttfb_ms: nav ? nav.responseStart - nav.startTime : null,
+            dom_content_loaded_ms: nav ? nav.domContentLoadedEventEnd - nav.startTime : null,
+            load_event_ms: nav ? nav.loadEventEnd - nav.startTime : null,
+            fcp_ms: paint['first-contentful-paint'] === undefined ? null : paint['first-contentful-paint'],
+            resources: resources.length,
+            transfer_bytes: bytes
+        });
+    })();
+    """
+    # Emitted with every stored record
+    recorded = pyqtSignal(dict)
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.loads = {}
+
+    def attach(self, view):
+        view.loadStarted.connect(lambda view=view: self.load_started(view))
+        view.loadProgress.connect(lambda progress, view=view: self.load_progress(view, progress))
+        view.loadFinished.connect(lambda ok, view=view: self.load_finished(view, ok))
+        view.destroyed.connect(lambda _=None, key=id(view): self.loads.pop(key, None))
+
+    def load_started(self, view):
+        self.loads[id(view)] = {"started": time.monotonic(), "first_progress": None}
+
+    def load_progress(self, view, progress):
+        load = self.loads.get(id(view))
+        if load is not None and load["first_progress"] is None and progress > 0:
+            load["first_progress"] = time.monotonic()
+
+    def load_finished(self, view, ok):
+        load = self.loads.pop(id(view), None)
+        url = view.url()
+        if load is None or url.scheme() not in ("http", "https", "file"):
+            return
+        finished = time.monotonic()
+        record = {
+            "ts": time.time(),
+            "url": url.toString(),
+            "origin": url.adjusted(QUrl.RemovePath | QUrl.RemoveQuery | QUrl.RemoveFragment).toString(),
+            "ok": ok,
+            "load_ms": (finished - load["started"]) * 1000,
+            "first_progress_ms": (load["first_progress"] - load["started"]) * 1000 if load["first_progress"] else None,
+        }
+        if not ok:
+            self.save(record)
+            return
+        view.page().runJavaScript(self.COLLECT_JS, QWebEngineScript.ApplicationWorld,
+                                  lambda result, record=record: self.timings_collected(record, result))
+
+    def timings_collected(self, record, result):
+        try:
+            record.update(json.loads(result) if result else {})
+        except (TypeError, ValueError):
+            pass
+        self.save(record)
+
+    def save(self, record):
+        try:
+            self.store.add(record)
+        except sqlite3.Error as e:
+            print(f"Could not store page load timing: {e}")
+            return
+        self.recorded.emit(record)
+
+class HistoryStore:
+    """ Browsing history in SQLite with an FTS5 index over URL and title.
+
+    Visits are queued and committed in batches by a writer thread; suggestions are
+    read from a separate connection on the calling thread. Frecency is stored as
+    ln(visits) + last_visit / DECAY, which orders URLs like visits * e^(-age / DECAY)
+    without ever having to be recomputed as time passes.
+    """
+    DECAY = 30 * 86400
+    BATCH_SIZE = 200
+    FLUSH_INTERVAL = 1.0
+    # Above this many full-text matches the whole frecency index is scanned instead
+    CANDIDATES = 2000
+    SKIPPED_SCHEMES = ("kkurl:", "about:", "data:", "chrome:", "view-source:")
+
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS urls(
+            id INTEGER PRIMARY KEY, url TEXT UNIQUE NOT NULL, title TEXT,
+            visit_count INTEGER NOT NULL DEFAULT 0, last_visit REAL, frecency REAL NOT NULL DEFAULT 0)""",
+        # Covers the suggestion scan so it never has to touch the table itself
+        "CREATE INDEX IF NOT EXISTS urls_frecency ON urls(frecency DESC, url, title)",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS urls_fts USING fts5(url, title, content='urls', content_rowid='id', prefix='1 2 3 4 5 6')",
+        """CREATE TRIGGER IF NOT EXISTS urls_ai AFTER INSERT ON urls BEGIN
+            INSERT INTO urls_fts(rowid, url, title) VALUES (new.id, new.url, new.title); END""",
+        """CREATE TRIGGER IF NOT EXISTS urls_ad AFTER DELETE ON urls BEGIN
+            INSERT INTO urls_fts(urls_fts, rowid, url, title) VALUES ('delete', old.id, old.url, old.title); END""",
+        """CREATE TRIGGER IF NOT EXISTS urls_au AFTER UPDATE OF url, title ON urls BEGIN
+            INSERT INTO urls_fts(urls_fts, rowid, url, title) VALUES ('delete', old.id, old.url, old.title);
+            INSERT INTO urls_fts(rowid, url, title) VALUES (new.id, new.url, new.title); END""",
+    ]
+
+    def __init__(self, path):
+        # Off-the-record history lives in a shared in-memory database
+        self.uri = path.startswith("file:")
+        self.path = path
+        self.db = self.connect()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        for statement in self.SCHEMA:
+            self.db.execute(statement)
+        self.db.commit()
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target=self.write_loop, name="history-writer", daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        db = sqlite3.connect(self.path, uri=self.uri)
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @staticmethod
+    def frecency(visit_count, last_visit):
+        return math.log(visit_count) + last_visit / HistoryStore.DECAY
+
+    def record_visit(self, url, title=None, ts=None):
+        if url and not url.startswith(self.SKIPPED_SCHEMES):
+            self.queue.put(("visit", url, title, ts or time.time()))
+
+    def record_title(self, url, title):
+        if url and title and not url.startswith(self.SKIPPED_SCHEMES):
+            self.queue.put(("title", url, title, None))
+
+    def flush(self):
+        """ Block until everything queued so far is committed. """
+        done = threading.Event()
+        self.queue.put(("flush", done, None, None))
+        done.wait()
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+        self.db.close()
+
+    def write_loop(self):
+        db = self.connect()
+        pending = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = ("flush", None, None, None)
+            if item is None or item[0] == "flush":
+                self.apply(db, pending)
+                pending = []
+                deadline = None
+                if item is None:
+                    break
+                if item[1] is not None:
+                    item[1].set()
+                continue
+            pending.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.FLUSH_INTERVAL
+            if len(pending) >= self.BATCH_SIZE:
+                self.apply(db, pending)
+                pending = []
+                deadline = None
+        db.close()
+
+    def apply(self, db, items):
+        """ Commit a batch of visits and title updates in one transaction. """
+        if not items:
+            return
+        try:
+            with db:
+                for kind, url, title, ts in items:
+                    if kind == "title":
+                        db.execute("UPDATE urls SET title = ? WHERE url = ?", (title, url))
+                        continue
+                    row = db.execute("SELECT visit_count FROM urls WHERE url = ?", (url,)).fetchone()
+                    visits = (row[0] if row else 0) + 1
+                    if row:
+                        db.execute("UPDATE urls SET visit_count = ?, last_visit = ?, frecency = ?, title = coalesce(?, title) WHERE url = ?",
+                                   (visits, ts, self.frecency(visits, ts), title, url))
+                    else:
+                        db.execute("INSERT INTO urls(url, title, visit_count, last_visit, frecency) VALUES (?,?,?,?,?)",
+                                   (url, title, visits, ts, self.frecency(visits, ts)))
+        except sqlite3.Error as e:
+            print(f"Could not write history: {e}")
+
+    def suggest(self, text, limit=8):
+        """ Best (url, title) matches for the typed text, highest frecency first. """
+        # The scheme and www. are in nearly every URL and would only slow the lookup down
+        text = re.sub(r"^\s*(?:https?:/*)?(?:www\.)?", "", text.lower())
+        terms = re.findall(r"\w+", text)
+        if not terms:
+            return []
+        conditions = " AND ".join("(url LIKE ? ESCAPE '\\' OR title LIKE ? ESCAPE '\\')" for _ in terms)
+        params = []
+        for term in terms:
+            pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            params += [pattern, pattern]
+
+        # Rare input: the full-text index finds every match, which are then ranked exactly
+        match = " AND ".join(f'"{term}"*' for term in terms)
+        ids = [row[0] for row in self.db.execute(
+            "SELECT rowid FROM urls_fts WHERE urls_fts MATCH ? LIMIT ?", (match, self.CANDIDATES))]
+        if len(ids) < self.CANDIDATES:
+            if not ids:
+                return []
+            return self.db.execute(
+                f"SELECT url, title FROM urls WHERE id IN ({','.join('?' * len(ids))}) ORDER BY frecency DESC LIMIT ?",
+                ids + [limit]).fetchall()
+        # Common input: walking the (covering) frecency index hits enough matches almost at once
+        return self.db.execute(
+            f"SELECT url, title FROM urls INDEXED BY urls_frecency WHERE {conditions} ORDER BY frecency DESC LIMIT ?",
+            params + [limit]).fetchall()
+
+def normalize_url(url):
+    """ URL without scheme, www. and trailing slash, for comparing typed and loaded URLs. """
+    url = re.sub(r"^[a-z][a-z0-9+.-]*://", "", url.strip().lower())
+    if url.startswith("www."):
+        url = url[4:]
+    return url.rstrip("/")
+
+class SpeculativeLoader(QObject):
+    """ Warms up the most likely URL bar destination while the user is still typing.
+
+    A confident prediction (the typed text is the start of a URL visited before) is
+    prerendered in an off-screen page that replaces the tab's page on commit. Anything
+    else only gets a preconnect/dns-prefetch hint from a tiny hidden page. At most
+    max_pages prerendered pages exist at a time; the oldest one is dropped first.
+    """
+    DEBOUNCE_MS = 150
+    MAX_AGE = 60
+
+    def __init__(self, browser, mode="prerender", max_pages=2):
+        super().__init__(browser)
+        self.browser = browser
+        self.mode = mode
+        self.max_pages = max_pages
+        self.pages = OrderedDict()
+        self.hint_page = None
+        self.hinted = None
+        self.pending = None
+        self.stats = {"prerenders": 0, "preconnects": 0, "hits": 0, "misses": 0, "saved_ms": 0.0}
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.speculate)
+        self.expiry = QTimer(self)
+        self.expiry.timeout.connect(self.expire)
+        self.expiry.start(10000)
+
+    def predict(self, text, suggestions):
+        """ Called on every URL bar edit with the history suggestions for text. """
+        if self.mode == "off":
+            return
+        self.pending = (text, suggestions)
+        self.timer.start(self.DEBOUNCE_MS)
+
+    def speculate(self):
+        text, suggestions = self.pending
+        typed = normalize_url(text)
+        if len(typed) < 3:
+            return
+        if suggestions:
+            url = suggestions[0][0]
+            if self.mode == "prerender" and normalize_url(url).startswith(typed):
+                self.prerender(url)
+            else:
+                self.preconnect(url)
+        elif "." in typed and " " not in typed:
+            # Looks like a host that is not in the history yet
+            self.preconnect("https://" + typed.split("/")[0])
+
+    def preconnect(self, url):
+        origin = QUrl(url).adjusted(QUrl.RemovePath | QUrl.RemoveQuery | QUrl.RemoveFragment).toString()
+        if not origin or origin == self.hinted:
+            return
+        if self.hint_page is None:
+            self.hint_page = QWebEnginePage(self.browser.profile, self)
+        self.hinted = origin
+        escaped = html.escape(origin, quote=True)
+        self.hint_page.setHtml(f'<link rel="preconnect" href="{escaped}"><link rel="dns-prefetch" href="{escaped}">',
+                               QUrl("about:blank"))
+        self.stats["preconnects"] += 1
+
+    def prerender(self, url):
+        key = normalize_url(url)
+        if key in self.pages:
+            return
+        while len(self.pages) >= self.max_pages:
+            self.drop(next(iter(self.pages)))
+        page = CustomWebEnginePage(self.browser.profile, self)
+        self.browser.attach_page(page)
+        entry = {"page": page, "url": url, "started": time.monotonic(), "finished": None}
+        page.loadFinished.connect(lambda ok, entry=entry: entry.update(finished=time.monotonic() if ok else None))
+        self.pages[key] = entry
+        page.setUrl(QUrl(url))
+        self.stats["prerenders"] += 1
+
+    def take(self, url):
+        """ Hand over the prerendered page for url, if there is one. """
+        entry = self.pages.pop(normalize_url(url), None)
+        if entry is None:
+            if self.stats["prerenders"]:
+                self.stats["misses"] += 1
+            return None
+        # What the user did not have to wait for: the whole load, or the part already done
+        end = entry["finished"] or time.monotonic()
+        self.stats["hits"] += 1
+        self.stats["saved_ms"] += (end - entry["started"]) * 1000
+        return entry["page"]
+
+    def drop(self, key):
+        entry = self.pages.pop(key, None)
+        if entry is not None:
+            entry["page"].deleteLater()
+
+    def expire(self):
+        now = time.monotonic()
+        for key in [key for key, entry in self.pages.items() if now - entry["started"] > self.MAX_AGE]:
+            self.drop(key)
+
+    def hit_rate(self):
+        attempts = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / attempts if attempts else None
+
+def serialize_history(history):
+    """ A QWebEngineHistory (back/forward list and page state) as base64 text. """
+    data = QByteArray()
+    stream = QDataStream(data, QIODevice.WriteOnly)
+    stream << history
+    return bytes(data.toBase64()).decode("ascii")
+
+def restore_history(history, text):
+    """ Load serialize_history() output into a page's history, which navigates to its current entry. """
+    stream = QDataStream(QByteArray.fromBase64(text.encode("ascii")), QIODevice.ReadOnly)
+    stream >> history
+    return stream.status() == QDataStream.Ok
+
+def process_memory_mb(pid):
+    """ Resident memory of a process in MB, or None when it cannot be measured. """
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+class Tab:
+    """ A browser tab. view is None while the tab is only a placeholder (discarded or not loaded yet). """
+    def __init__(self, url=None, title="New Tab"):
+        self.view = None
+        self.url = url
+        self.title = title
+        self.scroll = (0, 0)
+        # Serialized QWebEngineHistory to bring back with the view, see serialize_history()
+        self.state = None
+        self.discarded = False
+        self.last_active = time.monotonic()
+
+    def page(self):
+        return self.view.page() if self.view is not None else None
+
+    def is_live(self):
+        if self.view is None:
+            return False
+        if HAS_LIFECYCLE:
+            return self.view.page().lifecycleState() != QWebEnginePage.LifecycleState.Discarded
+        return True
+
+class TabManager(QObject):
+    """ The tab model: a tab strip plus a stack holding one view (and page) per live tab. """
+    currentChanged = pyqtSignal(object)
+
+    def __init__(self, view_factory, parent=None):
+        super().__init__(parent)
+        self.view_factory = view_factory
+        self.tabs = []
+        self.current_tab = None
+
+        self.bar = QTabBar(parent)
+        self.bar.setTabsClosable(True)
+        self.bar.setExpanding(False)
+        self.bar.setElideMode(Qt.ElideRight)
+        self.bar.currentChanged.connect(self.tab_selected)
+        self.bar.tabCloseRequested.connect(lambda index: self.close_tab(self.tabs[index]))
+        self.stack = QStackedWidget(parent)
+
+        self.lifecycle = TabLifecycleManager(self)
+
+    def new_tab(self, url=None, background=False):
+        """ Open a tab with a live view and return it. """
+        tab = Tab(url)
+        self.tabs.append(tab)
+        self.create_view(tab)
+        if url:
+            tab.view.setUrl(QUrl(url))
+        self.bar.addTab(tab.title)
+        if background:
+            self.lifecycle.touched(tab)
+            self.lifecycle.enforce()
+        else:
+            self.activate(tab)
+        return tab
+
+    def add_placeholder(self, url, title="New Tab"):
+        """ Add a tab that is only loaded once it gets activated. """
+        tab = Tab(url, title)
+        tab.discarded = True
+        self.tabs.append(tab)
+        self.bar.addTab(title)
+        return tab
+
+    def restore(self, records, current=0):
+        """ Recreate saved tabs as placeholders; only the current one gets a view and loads. """
+        # Adding the first tab would select (and load) it right away
+        first = len(self.tabs)
+        self.bar.blockSignals(True)
+        try:
+            for record in records:
+                tab = self.add_placeholder(record.get("url"), record.get("title") or "New Tab")
+                tab.scroll = tuple(record.get("scroll") or (0, 0))
+                tab.state = record.get("history")
+        finally:
+            self.bar.blockSignals(False)
+        if len(self.tabs) > first:
+            self.activate(self.tabs[first + min(max(current, 0), len(self.tabs) - first - 1)])
+
+    def create_view(self, tab):
+        view = self.view_factory(tab)
+        view.titleChanged.connect(lambda title, tab=tab: self.set_title(tab, title))
+        view.urlChanged.connect(lambda url, tab=tab: setattr(tab, "url", url.toString()))
+        self.stack.addWidget(view)
+        tab.view = view
+        return view
+
+    def tab_selected(self, index):
+        if 0 <= index < len(self.tabs):
+            self.activate(self.tabs[index])
+
+    def activate(self, tab):
+        """ Make tab the visible one, bringing it back to life if it was frozen or discarded. """
+        index = self.tabs.index(tab)
+        self.current_tab = tab
+        if self.bar.currentIndex() != index:
+            self.bar.setCurrentIndex(index)
+        self.wake(tab)
+        self.stack.setCurrentWidget(tab.view)
+        tab.last_active = time.monotonic()
+        self.lifecycle.touched(tab)
+        self.lifecycle.enforce()
+        self.currentChanged.emit(tab)
+
+    def wake(self, tab):
+        if tab.view is None:
+            self.create_view(tab)
+            state, tab.state = tab.state, None
+            if not (state and restore_history(tab.view.history(), state)) and tab.url:
+                tab.view.setUrl(QUrl(tab.url))
+        elif HAS_LIFECYCLE:
+            # Discarded pages reload by themselves once they are active again
+            tab.view.page().setLifecycleState(QWebEnginePage.LifecycleState.Active)
+        if tab.discarded:
+            tab.discarded = False
+            self.restore_scroll(tab)
+
+    def restore_scroll(self, tab):
+        x, y = tab.scroll
+        if not (x or y):
+            return
+        view = tab.view
+
+        def on_load(ok):
+            view.loadFinished.disconnect(on_load)
+            if ok:
+                view.page().runJavaScript(f"window.scrollTo({x}, {y});")
+        view.loadFinished.connect(on_load)
+
+    def freeze(self, tab):
+        page = tab.page()
+        if HAS_LIFECYCLE and page is not None and page.lifecycleState() == QWebEnginePage.LifecycleState.Active:
+            if not page.recentlyAudible():
+                page.setLifecycleState(QWebEnginePage.LifecycleState.Frozen)
+
+    def discard(self, tab):
+        """ Free a background tab, remembering its URL and scroll position. """
+        if tab is self.current_tab or not tab.is_live():
+            return
+        page = tab.page()
+        tab.url = page.url().toString() or tab.url
+        position = page.scrollPosition()
+        tab.scroll = (int(position.x()), int(position.y()))
+        tab.discarded = True
+        if HAS_LIFECYCLE:
+            page.setLifecycleState(QWebEnginePage.LifecycleState.Discarded)
+        else:
+            # The back/forward list goes with the view, keep it for wake()
+            tab.state = serialize_history(page.history())
+            self.stack.removeWidget(tab.view)
+            tab.view.deleteLater()
+            tab.view = None
+        print(f"Discarded tab: {tab.url}")
+
+    def close_tab(self, tab):
+        index = self.tabs.index(tab)
+        self.lifecycle.forget(tab)
+        self.tabs.pop(index)
+        if tab.view is not None:
+            self.stack.removeWidget(tab.view)
+            tab.view.deleteLater()
+            tab.view = None
+        if tab is self.current_tab:
+            self.current_tab = None
+        # Removing the tab selects a neighbour, which activates it through tab_selected
+        self.bar.removeTab(index)
+        if not self.tabs:
+            self.new_tab(self.parent().home_url)
+
+    def set_title(self, tab, title):
+        tab.title = title or tab.url or "New Tab"
+        if tab in self.tabs:
+            index = self.tabs.index(tab)
+            self.bar.setTabText(index, tab.title[:30])
+            self.bar.setTabToolTip(index, tab.title)
+
+    def current_view(self):
+        return self.current_tab.view if self.current_tab is not None else None
+
+    def live_views(self):
+        return [tab.view for tab in self.tabs if tab.is_live()]
+
+class TabLifecycleManager(QObject):
+    """ Freezes idle background tabs and discards the least recently used ones.
+
+    Discarding starts once more than max_live_tabs tabs are loaded, or when the
+    browser and its renderer processes use more than memory_budget_mb (0 = no budget).
+    """
+    def __init__(self, tabs, max_live_tabs=10, memory_budget_mb=0, freeze_after=60):
+        super().__init__(tabs)
+        self.tabs = tabs
+        self.max_live_tabs = max_live_tabs
+        self.memory_budget_mb = memory_budget_mb
+        self.freeze_after = freeze_after
+        self.lru = OrderedDict()
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.enforce)
+        self.timer.start(5000)
+
+    def touched(self, tab):
+        self.lru[tab] = None
+        self.lru.move_to_end(tab)
+
+    def forget(self, tab):
+        self.lru.pop(tab, None)
+
+    def memory_usage_mb(self):
+        pids = {os.getpid()}
+        for view in self.tabs.live_views():
+            page = view.page()
+            if hasattr(page, "renderProcessPid") and page.renderProcessPid() > 0:
+                pids.add(page.renderProcessPid())
+        total = 0
+        for pid in pids:
+            used = process_memory_mb(pid)
+            if used is None:
+                return None
+            total += used
+        return total
+
+    def enforce(self):
+        now = time.monotonic()
+        background = [tab for tab in self.lru if tab is not self.tabs.current_tab and tab.is_live()]
+
+        for tab in background:
+            if now - tab.last_active > self.freeze_after:
+                self.tabs.freeze(tab)
+
+        live = len(self.tabs.live_views())
+        while background and live > self.max_live_tabs:
+            self.tabs.discard(background.pop(0))
+            live -= 1
+
+        if self.memory_budget_mb and background:
+            used = self.memory_usage_mb()
+            # Memory is only released after the renderer reacts, so discard one tab per check
+            if used is not None and used > self.memory_budget_mb:
+                self.tabs.discard(background.pop(0))
+
+class SessionStore(QObject):
+    """ Periodically snapshots the open tabs to session.json so the next start can restore them.
+
+    A tab's history is only re-serialized when its URL, title or history changed since
+    the last snapshot, and the file is only rewritten (atomically) when the snapshot
+    differs from what was written last. path None (off the record) keeps nothing.
+    """
+    VERSION = 1
+    SAVE_INTERVAL = 10000
+
+    def __init__(self, path, tabs, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.tabs = tabs
+        # tab -> (change key, record)
+        self.records = {}
+        self.written = None
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.save)
+        if path is not None:
+            self.timer.start(self.SAVE_INTERVAL)
+
+    def load(self):
+        """ The saved session ({"current": index, "tabs": [record]}) or None. """
+        if self.path is None:
+            return None
+        try:
+            with open(self.path, "r") as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(session, dict) or session.get("version") != self.VERSION or not session.get("tabs"):
+            return None
+        return session
+
+    def record(self, tab):
+        page = tab.page()
+        if page is None:
+            # Placeholder: everything is already on the tab
+            return {"url": tab.url, "title": tab.title, "scroll": list(tab.scroll), "history": tab.state}
+        history = page.history()
+        key = (tab.url, tab.title, history.count(), history.currentItemIndex())
+        cached = self.records.get(tab)
+        if cached is not None and cached[0] == key:
+            record = cached[1]
+        else:
+            record = {"url": tab.url, "title": tab.title, "history": serialize_history(history)}
+            self.records[tab] = (key, record)
+        if tab.discarded:
+            record["scroll"] = list(tab.scroll)
+        else:
+            position = page.scrollPosition()
+            record["scroll"] = [int(position.x()), int(position.y())]
+        return record
+
+    def save(self):
+        """ Write the current tabs if anything changed. Returns True if the file was written. """
+        if self.path is None:
+            return False
+        tabs = self.tabs.tabs
+        records = [self.record(tab) for tab in tabs]
+        self.records = {tab: entry for tab, entry in self.records.items() if tab in tabs}
+        current = tabs.index(self.tabs.current_tab) if self.tabs.current_tab in tabs else 0
+        text = json.dumps({"version": self.VERSION, "current": current, "tabs": records})
+        if text == self.written:
+            return False
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, self.path)
+        self.written = text
+        return True
+
+KKURL_SCHEME = b"kkurl"
+
+def register_kkurl_scheme():
+    """ Register kkurl:// with QtWebEngine. Must run before the QApplication is created. """
+    scheme = QWebEngineUrlScheme(KKURL_SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    # LocalScheme: web pages cannot load or embed kkurl:// URLs, only other local pages can
+    flags = QWebEngineUrlScheme.SecureScheme | QWebEngineUrlScheme.LocalScheme | QWebEngineUrlScheme.LocalAccessAllowed
+    if hasattr(QWebEngineUrlScheme, "CorsEnabled"):
+        # Lets the internal pages fetch() their JSON endpoints (Qt 5.14+)
+        flags |= QWebEngineUrlScheme.CorsEnabled
+    scheme.setFlags(flags)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+EXTENSION_MANAGER_HTML = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Extension Management</title>
+    <style>
+        body { font-family: Arial, sans-serif; }
+        .extension-list { margin-top: 20px; }
+        .extension { margin-bottom: 10px; padding: 6px; border-bottom: 1px solid #ddd; }
+        .description { color: #666; font-size: 90%; }
+        .code-editor { width: 100%; height: 200px; }
+    </style>
+</head>
+<body>
+    <h1>Manage Extensions</h1>
+    <input id="filter" placeholder="Filter extensions..." />
+    <span id="count"></span>
+    <div id="extensions" class="extension-list"></div>
+    <div id="more"></div>
+    <script>
+        var PAGE_SIZE = 50;
+        var offset = 0, total = 0, loading = false, query = "";
+
+        function api(path, params) {
+            var search = new URLSearchParams(params || {}).toString();
+            return fetch("kkurl://ext/api/" + path + (search ? "?" + search : "")).then(function(r) { return r.json(); });
+        }
+
+        function post(path, params) {
+            var search = new URLSearchParams(params || {}).toString();
+            return fetch("kkurl://ext/api/" + path + "?" + search, {method: "POST"}).then(function(r) { return r.json(); });
+        }
+
+        function renderExtension(ext) {
+            var div = document.createElement("div");
+            div.className = "extension";
+            var label = document.createElement("label");
+            var checkbox = document.createElement("input");
+            checkbox.type = "checkbox";
+            checkbox.checked = ext.enabled;
+            checkbox.onclick = function() { toggleExtension(ext.name, checkbox.checked); };
+            label.appendChild(checkbox);
+            label.appendChild(document.createTextNode(" " + ext.name + " " + (ext.version || "")));
+            var description = document.createElement("div");
+            description.className = "description";
+            description.textContent = (ext.description || "") + (ext.matches.length ? " - " + ext.matches.join(", ") : "");
+            var show = document.createElement("button");
+            show.textContent = "Show code";
+            show.onclick = function() { showCode(ext.name, div, show); };
+            div.appendChild(label);
+            div.appendChild(description);
+            div.appendChild(show);
+            return div;
+        }
+
+        function showCode(name, div, button) {
+            button.disabled = true;
+            Promise.all([api("script", {name: name, kind: "background"}), api("script", {name: name, kind: "content"})]).then(function(scripts) {
+                scripts.forEach(function(script) {
+                    var textarea = document.createElement("textarea");
+                    textarea.className = "code-editor";
+                    textarea.id = script.kind + "_" + name;
+                    textarea.value = script.code;
+                    div.appendChild(textarea);
+                });
+                var save = document.createElement("button");
+                save.textContent = "Save Changes";
+                save.onclick = function() { updateCode(name); };
+                div.appendChild(save);
+                button.remove();
+            });
+        }
+
+        function loadPage() {
+            if (loading || (offset > 0 && offset >= total)) return;
+            loading = true;
+            api("extensions", {offset: offset, limit: PAGE_SIZE, q: query}).then(function(page) {
+                total = page.total;
+                var list = document.getElementById("extensions");
+                page.items.forEach(function(ext) { list.appendChild(renderExtension(ext)); });
+                offset += page.items.length;
+                document.getElementById("count").textContent = total + " extensions";
+                loading = false;
+            });
+        }
+
+        function reload() {
+            offset = 0;
+            total = 0;
+            document.getElementById("extensions").innerHTML = "";
+            loadPage();
+        }
+
+        function toggleExtension(extensionName, enabled) {
+            post("toggle", {name: extensionName, enabled: enabled ? 1 : 0});
+        }
+
+        function updateCode(extensionName) {
+            var backgroundCode = document.getElementById("background_" + extensionName).value;
+            var contentCode = document.getElementById("content_" + extensionName).value;
+            // Call backend to save code and apply changes
+            alert("Updating " + extensionName);
+        }
+
+        // Only the visible part of the list is fetched; more is loaded while scrolling
+        new IntersectionObserver(function(entries) {
+            if (entries[0].isIntersecting) loadPage();
+        }).observe(document.getElementById("more"));
+
+        var filterTimer = null;
+        document.getElementById("filter").oninput = function(e) {
+            clearTimeout(filterTimer);
+            filterTimer = setTimeout(function() { query = e.target.value; reload(); }, 150);
+        };
+        loadPage();
+    </script>
+</body>
+</html>
+""".encode("utf-8")
+
+START_URL = "kkurl://start"
+# Shown first with --fast-start: served from memory, so nothing waits on the network or the disk
+START_PAGE_HTML = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>New Tab</title>
+    <style>
+        body { font-family: Arial, sans-serif; display: flex; align-items: center; justify-content: center; height: 90vh; color: #444; }
+    </style>
+</head>
+<body><h1>KKURL</h1></body>
+</html>
+""".encode("utf-8")
+
+class KKurlSchemeHandler(QWebEngineUrlSchemeHandler):
+    """ Serves the internal kkurl:// pages.
+
+    kkurl://ext/ is a static shell that pulls extension metadata in pages from
+    kkurl://ext/api/extensions and script bodies one at a time from
+    kkurl://ext/api/script, so opening it never reads every extension's code.
+    The /api/ routes only answer requests made by kkurl:// pages, and
+    /api/toggle, which changes state, only answers POST.
+    """
+    def __init__(self, browser):
+        super().__init__(browser)
+        self.browser = browser
+
+    def requestStarted(self, job):
+        url = job.requestUrl()
+        query = QUrlQuery(url)
+        route = (url.host(), url.path().rstrip("/"))
+        if route[1].startswith("/api/") and job.initiator().scheme() != KKURL_SCHEME.decode():
+            job.fail(QWebEngineUrlRequestJob.RequestDenied)
+            return
+        if route == ("ext", "/api/toggle") and bytes(job.requestMethod()) != b"POST":
+            job.fail(QWebEngineUrlRequestJob.RequestDenied)
+            return
+        try:
+            if route == ("ext", ""):
+                self.reply(job, b"text/html", EXTENSION_MANAGER_HTML)
+            elif route == ("ext", "/api/extensions"):
+                self.reply_json(job, self.list_extensions(query))
+            elif route == ("ext", "/api/script"):
+                self.reply_json(job, self.script(query))
+            elif route == ("ext", "/api/toggle"):
+                self.reply_json(job, self.toggle(query))
+            elif route == ("start", ""):
+                self.reply(job, b"text/html", START_PAGE_HTML)
+            elif route == ("perf", ""):
+                self.reply(job, b"text/html", self.browser.perf_dashboard_html().encode("utf-8"))
+            else:
+                job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+        except KeyError:
+            job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+        except ValueError:
+            # Malformed query values, e.g. ?offset=x
+            job.fail(QWebEngineUrlRequestJob.RequestFailed)
+
+    def reply(self, job, content_type, data):
+        # The buffer is parented to the job so it lives exactly as long as the reply
+        buffer = QBuffer(job)
+        buffer.setData(data)
+        buffer.open(QIODevice.ReadOnly)
+        job.reply(content_type, buffer)
+
+    def reply_json(self, job, payload):
+        self.reply(job, b"application/json", json.dumps(payload).encode("utf-8"))
+
+    def list_extensions(self, query):
+        offset = int(query.queryItemValue("offset") or 0)
+        limit = min(int(query.queryItemValue("limit") or 50), 500)
+        needle = query.queryItemValue("q").lower()
+        names = sorted(name for name in self.browser.extensions if needle in name.lower())
+        items = []
+        for name in names[offset:offset + limit]:
+            extension = self.browser.extensions[name]
+            manifest = extension.manifest
+            items.append({
+                "name": name,
+                "enabled": extension.enabled,
+                "version": manifest.get("version", ""),
+                "description": manifest.get("description", ""),
+                "matches": [pattern for group in manifest.get("content_scripts") or [] for pattern in group.get("matches") or []],
+            })
+        return {"total": len(names), "offset": offset, "items": items}
+
+    def script(self, query):
+        extension = self.browser.extensions[query.queryItemValue("name")]
+        kind = query.queryItemValue("kind")
+        path = extension.background_script if kind == "background" else extension.content_script
+        return {"name": extension.name, "kind": kind, "code": self.browser.script_cache.read(path) or ""}
+
+    def toggle(self, query):
+        name = query.queryItemValue("name")
+        enabled = query.queryItemValue("enabled") == "1"
+        # Go through the dock checkbox so both UIs stay in sync
+        checkbox = self.browser.extension_list.itemWidget(self.browser.extension_items[name])
+        checkbox.setChecked(enabled)
+        return {"name": name, "enabled": self.browser.extensions[name].enabled}
+
+class Browser(QMainWindow):
+    # Fast start goes on without a paint event after this long (ms), e.g. when started minimized
+    FIRST_PAINT_TIMEOUT = 1000
+
+    def __init__(self, config=None, trace=None):
         super().__init__()
+        self.trace = trace or StartupTrace()
         self.setWindowTitle("KKURL BROWSER")
         self.setGeometry(100, 100, 1200, 800)
-        
-        self.cache_folder = os.path.join(os.getenv("USERPROFILE"), "Documents", "QtWebEngine", "Cache")
-        if not os.path.exists(self.cache_folder):
-            os.makedirs(self.cache_folder)
+        self.config = config or dict(DEFAULT_CONFIG)
+        # Fast start shows the window with a local start page first; navigation, the extension
+        # dock and the extension scan follow after the first paint, see finish_startup()
+        self.fast_start = self.config["fast_start"]
+        self.painted = False
+
+        # Profile with its own storage and a bounded HTTP cache
+        self.profiles = ProfileManager(self.config)
+        self.profile = profile = self.profiles.open(self)
+        # Prewarm: the first tab's page starts its renderer process now and runs while the window is built
+        self.prewarmed_page = None
+        if self.config["prewarm"]:
+            self.prewarmed_page = CustomWebEnginePage(profile, self)
+            self.prewarmed_page.setUrl(QUrl("about:blank"))
+        self.trace.mark("profile")
+
+        # Extension scripts are read once and cached; content scripts go into matching
+        # pages, background scripts into one persistent hidden page per extension
+        self.script_cache = ScriptCache()
+        self.injector = ScriptInjector(self.script_cache)
+        self.background_host = BackgroundHost(profile, self.script_cache, self)
+        # Content scripts only go into pages whose URL matches the manifest patterns
+        self.match_index = URLMatchIndex()
 
-        profile = QWebEngineProfile.defaultProfile()
-        profile.setCachePath(self.cache_folder)
+        # Internal kkurl:// pages
+        self.scheme_handler = KKurlSchemeHandler(self)
+        profile.installUrlSchemeHandler(KKURL_SCHEME, self.scheme_handler)
+
+        # Browsing history, used for URL bar suggestions
+        if self.profiles.off_the_record:
+            self.history = HistoryStore(f"file:kkurl-history-{id(self)}?mode=memory&cache=shared")
+        else:
+            self.history = HistoryStore(os.path.join(self.profiles.storage_path, "history.sqlite"))
+
+        # Preconnect to / prerender the likely destination while the user types
+        self.speculation = SpeculativeLoader(self, self.config["prediction"], self.config["max_speculative_pages"])
+
+        # Page-load telemetry, shown on kkurl://perf
+        self.perf_store = PerfStore(os.path.join(self.profiles.storage_path, "perf.sqlite")) if not self.profiles.off_the_record \
+            else PerfStore(":memory:")
+        self.perf = PerfRecorder(self.perf_store, self)
+
+        # Content blocker; the filter lists are compiled in the background and swapped in
+        self.blocked_counts = {}
+        self.blocker = ContentBlocker(FilterEngine(), self)
+        self.blocker.blocked.connect(self.count_blocked)
+        if self.config["content_blocking"]:
+            profile.setUrlRequestInterceptor(self.blocker)
+            filter_paths = sorted(glob.glob(os.path.join(data_dir(), "filters", "*.txt"))) + list(self.config["filter_lists"])
+            self.filter_loader = FilterLoader(filter_paths, self)
+            self.filter_loader.loaded.connect(self.filters_loaded)
+            self.filter_loader.start()
+        self.trace.mark("services")
 
         self.main_widget = QWidget(self)
         self.main_layout = QVBoxLayout(self.main_widget)
@@ -61,6 +2206,13 @@ class Browser(QMainWindow):
         # URL bar and navigation buttons
         self.url_bar = QLineEdit(self)
         self.url_bar.returnPressed.connect(self.load_url_from_input)
+        self.url_model = QStringListModel(self)
+        self.url_completer = QCompleter(self.url_model, self)
+        # Suggestions are already ranked by the history store, the completer must not filter them
+        self.url_completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.url_completer.setMaxVisibleItems(8)
+        self.url_bar.setCompleter(self.url_completer)
+        self.url_bar.textEdited.connect(self.update_suggestions)
         self.url_layout = QHBoxLayout()
         self.url_layout.addWidget(self.url_bar)
 
@@ -78,67 +2230,192 @@ class Browser(QMainWindow):
         self.nav_layout.addWidget(self.forward_button)
         self.nav_layout.addWidget(self.reload_button)
         self.nav_layout.addWidget(self.refresh_button)
+        self.blocked_label = QLabel("Blocked: 0", self)
+        self.nav_layout.addWidget(self.blocked_label)
 
         self.main_layout.addLayout(self.nav_layout)
         self.main_layout.addLayout(self.url_layout)
 
-        # Custom WebEngine View with overridden URL handling
-        self.webview = CustomWebEngineView(self)
-        self.webview.setUrl(QUrl("http://www.google.com"))
-
-        # Connecting the loadFinished signal correctly
-        self.webview.loadFinished.connect(self.update_url)
+        # Tabs: one page per tab, background tabs get frozen/discarded by the lifecycle manager
+        self.home_url = self.config["home_url"]
+        self.tabs = TabManager(self.create_view, self)
+        self.tabs.lifecycle.max_live_tabs = self.config["max_live_tabs"]
+        self.tabs.lifecycle.memory_budget_mb = self.config["memory_budget_mb"]
+        self.tabs.currentChanged.connect(lambda tab: self.update_url())
+        self.tabs.currentChanged.connect(lambda tab: self.update_blocked_label())
+        self.new_tab_button = QPushButton("New Tab", self)
+        self.new_tab_button.clicked.connect(lambda: self.tabs.new_tab(self.home_url))
+        self.nav_layout.addWidget(self.new_tab_button)
 
-        self.main_layout.addWidget(self.webview)
+        self.main_layout.insertWidget(0, self.tabs.bar)
+        self.main_layout.addWidget(self.tabs.stack)
         self.setCentralWidget(self.main_widget)
 
-        # Extension Management - Dockable Panel
+        # Button to add a new extension
+        self.add_extension_button = QPushButton("Add Extension", self)
+        self.add_extension_button.clicked.connect(self.add_extension)
+        self.main_layout.addWidget(self.add_extension_button)
+
+        # Button to show Extension Manager (new button)
+        self.extension_manager_button = QPushButton("Extension Manager", self)
+        self.extension_manager_button.clicked.connect(self.show_extension_manager)
+        self.main_layout.addWidget(self.extension_manager_button)
+        self.trace.mark("ui")
+
+        # Extensions are discovered in the background and kept up to date by a watcher, see start_extensions()
+        self.extensions_dir = os.path.join(os.getcwd(), "extensions")
+        self.extensions = {}
+        self.extension_items = {}
+        self.extension_mtimes = {}
+        self.scanner = None
+        self.rescan_pending = False
+        self.extension_manager = None
+        # Created empty here, so Add Extension and kkurl://ext work before fast start has built the dock
+        # and started the watcher; build_extension_dock() and start_extensions() only attach them
+        self.extension_list = QListWidget()
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.setSingleShot(True)
+        self.rescan_timer.setInterval(200)
+        self.rescan_timer.timeout.connect(self.load_extensions)
+        self.extension_watcher = QFileSystemWatcher(self)
+        self.extension_watcher.directoryChanged.connect(lambda _: self.rescan_timer.start())
+        self.extension_watcher.fileChanged.connect(lambda _: self.rescan_timer.start())
+
+        session_path = None if self.profiles.off_the_record else os.path.join(self.profiles.storage_path, "session.json")
+        self.session = SessionStore(session_path, self.tabs, self)
+        if self.fast_start:
+            self.tabs.new_tab(START_URL)
+            self.show()
+            self.trace.mark("show")
+            QTimer.singleShot(self.FIRST_PAINT_TIMEOUT, self.first_painted)
+        else:
+            self.open_start_tabs()
+            self.trace.mark("tabs")
+            self.build_extension_dock()
+            self.trace.mark("dock")
+            self.start_extensions()
+            self.trace.mark("extensions")
+            self.show()
+            self.trace.mark("show")
+
+    def open_start_tabs(self, replace=None):
+        """ Reopen the last session (only the current tab loads, the others are placeholders) or the home page.
+        replace, the fast start tab, is closed once the real tabs are there. """
+        session = self.session.load() if self.config["restore_session"] else None
+        if session is not None:
+            self.tabs.restore(session["tabs"], session.get("current", 0))
+            if replace is not None:
+                self.tabs.close_tab(replace)
+        elif replace is not None:
+            replace.view.setUrl(QUrl(self.home_url))
+        else:
+            self.tabs.new_tab(self.home_url)
+
+    def build_extension_dock(self):
+        """ Extension Management - Dockable Panel """
         self.extension_manager = QDockWidget("Extensions", self)
-        self.extension_list = QListWidget(self)
         self.extension_manager.setWidget(self.extension_list)
 
         self.addDockWidget(1, self.extension_manager)  # Dock on the left side
         self.setDockOptions(QMainWindow.AllowNestedDocks)
 
-        # Load extensions from local directory
-        self.extensions_dir = os.path.join(os.getcwd(), "extensions")
+    def start_extensions(self):
+        """ Load extensions from the local directory and watch it for changes. """
         if not os.path.exists(self.extensions_dir):
             os.makedirs(self.extensions_dir)
-
+        self.extension_watcher.addPath(self.extensions_dir)
         self.load_extensions()
 
-        # Button to add a new extension
-        self.add_extension_button = QPushButton("Add Extension", self)
-        self.add_extension_button.clicked.connect(self.add_extension)
-        self.main_layout.addWidget(self.add_extension_button)
+    def take_prewarmed_page(self):
+        page, self.prewarmed_page = self.prewarmed_page, None
+        return page
 
-        # Button to show Extension Manager (new button)
-        self.extension_manager_button = QPushButton("Extension Manager", self)
-        self.extension_manager_button.clicked.connect(self.show_extension_manager)
-        self.main_layout.addWidget(self.extension_manager_button)
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.painted:
+            QTimer.singleShot(0, self.first_painted)
 
-        self.show()
+    def first_painted(self):
+        if self.painted:
+            return
+        self.painted = True
+        self.trace.mark("first_paint")
+        if not self.fast_start:
+            self.trace.finish()
+            return
+        # One step per event loop turn, so input and repaints get in between
+        steps = [
+            ("navigate", lambda: self.open_start_tabs(replace=self.tabs.current_tab)),
+            ("dock", self.build_extension_dock),
+            ("extensions", self.start_extensions),
+        ]
+
+        def run_next():
+            phase, step = steps.pop(0)
+            step()
+            self.trace.mark(phase)
+            if steps:
+                QTimer.singleShot(0, run_next)
+            else:
+                self.trace.finish()
+        QTimer.singleShot(0, run_next)
 
     def load_extensions(self):
-        """ Load extensions from the local 'extensions' directory. """
-        self.extensions = []
-        self.extension_list.clear()  # Clear the list before reloading
-
-        for ext_name in os.listdir(self.extensions_dir):
-            ext_path = os.path.join(self.extensions_dir, ext_name)
-            if os.path.isdir(ext_path):
-                manifest_path = os.path.join(ext_path, "manifest.json")
-                if os.path.exists(manifest_path):
-                    with open(manifest_path, "r") as manifest_file:
-                        manifest = json.load(manifest_file)
-                    extension = Extension(ext_name, ext_path, manifest)
-                    self.extensions.append(extension)
+        """ Rescan the local 'extensions' directory in the background. """
+        if self.scanner is not None and self.scanner.isRunning():
+            self.rescan_pending = True
+            return
+        self.scanner = ExtensionScanner(self.extensions_dir, self.extension_mtimes, self)
+        self.scanner.batchReady.connect(self.add_extension_batch)
+        self.scanner.removed.connect(self.remove_extensions)
+        self.scanner.finished.connect(self.scan_finished)
+        self.scanner.start()
 
-                    item = QListWidgetItem(ext_name)
-                    checkbox = QCheckBox(f"Enable {ext_name}")
-                    checkbox.stateChanged.connect(lambda state, ext=extension: self.toggle_extension(state, ext))
-                    self.extension_list.addItem(item)
-                    self.extension_list.setItemWidget(item, checkbox)
+    def scan_finished(self):
+        if self.rescan_pending:
+            self.rescan_pending = False
+            self.load_extensions()
+
+    def add_extension_batch(self, batch):
+        """ Add new extensions to the list and refresh the ones whose manifest changed. """
+        watched = set(self.extension_watcher.files())
+        for ext_name, ext_path, manifest, mtime in batch:
+            self.extension_mtimes[ext_name] = mtime
+            manifest_path = os.path.join(ext_path, "manifest.json")
+            if manifest_path not in watched:
+                self.extension_watcher.addPath(manifest_path)
+
+            extension = self.extensions.get(ext_name)
+            if extension is not None:
+                extension.manifest = manifest
+                if extension.enabled:
+                    self.match_index.remove_extension(extension)
+                    self.match_index.add_extension(extension)
+                    self.injector.register(extension)
+                print(f"Reloaded extension: {ext_name}")
+                continue
+
+            extension = Extension(ext_name, ext_path, manifest)
+            self.extensions[ext_name] = extension
+
+            item = QListWidgetItem(ext_name)
+            checkbox = QCheckBox(f"Enable {ext_name}")
+            checkbox.stateChanged.connect(lambda state, ext=extension: self.toggle_extension(state, ext))
+            self.extension_list.addItem(item)
+            self.extension_list.setItemWidget(item, checkbox)
+            self.extension_items[ext_name] = item
+
+    def remove_extensions(self, names):
+        """ Drop extensions whose folder or manifest disappeared. """
+        for ext_name in names:
+            self.extension_mtimes.pop(ext_name, None)
+            extension = self.extensions.pop(ext_name, None)
+            if extension is not None and extension.enabled:
+                extension.disable(self)
+            item = self.extension_items.pop(ext_name, None)
+            if item is not None:
+                self.extension_list.takeItem(self.extension_list.row(item))
+            print(f"Removed extension: {ext_name}")
 
     def add_extension(self):
         """ Adds a new extension by creating necessary files (manifest, content, background). """
@@ -196,77 +2473,183 @@ document.body.style.backgroundColor = 'yellow';
         else:
             extension.disable(self)
 
+    @property
+    def webview(self):
+        """ The view of the current tab. """
+        return self.tabs.current_view()
+
+    def create_view(self, tab):
+        """ Create the view for a tab and hook it up to the browser. """
+        view = CustomWebEngineView(self)
+
+        # Connecting the loadFinished signal correctly
+        view.loadFinished.connect(lambda ok, view=view: self.update_url() if view is self.webview else None)
+
+        # Pick the content scripts for every navigation before the document is created
+        self.attach_page(view.page())
+        view.urlChanged.connect(lambda url, view=view: self.update_content_scripts(view.page(), url))
+        view.loadStarted.connect(lambda view=view: self.update_content_scripts(view.page(), view.page().requestedUrl()))
+
+        self.perf.attach(view)
+
+        view.urlChanged.connect(lambda url: self.history.record_visit(url.toString()))
+        view.titleChanged.connect(lambda title, view=view: self.history.record_title(view.url().toString(), title))
+        return view
+
+    def attach_page(self, page):
+        """ Hook up a page (a tab's or a prerendered one) to the per-page browser features. """
+        self.background_host.connect_page(page)
+        page.navigationRequested.connect(lambda url, page=page: self.update_content_scripts(page, url))
+        page.navigationRequested.connect(lambda url, page=page: self.reset_blocked(page, url))
+
+    def detach_page(self, page):
+        """ Undo attach_page for a page that is about to be deleted. """
+        self.background_host.disconnect_page(page)
+        self.injector.forget(page)
+
+    def filters_loaded(self, engine):
+        self.blocker.engine = engine
+        print(f"Content blocker loaded {engine.rule_count} rules ({engine.skipped} skipped)")
+
+    def count_blocked(self, first_party_url):
+        self.blocked_counts[first_party_url] = self.blocked_counts.get(first_party_url, 0) + 1
+        if self.webview is not None and self.webview.url().toString() == first_party_url:
+            self.update_blocked_label()
+
+    def reset_blocked(self, page, url):
+        """ A page starts a new navigation: drop the count of the page it leaves. """
+        self.blocked_counts.pop(page.url().toString(), None)
+        self.blocked_counts.pop(url.toString(), None)
+        if self.webview is not None and page is self.webview.page():
+            self.update_blocked_label()
+
+    def update_blocked_label(self):
+        count = self.blocked_counts.get(self.webview.url().toString(), 0) if self.webview is not None else 0
+        self.blocked_label.setText(f"Blocked: {count}")
+
+    def update_content_scripts(self, page, url):
+        """ Apply the content scripts of the enabled extensions matching url to page. """
+        names = self.match_index.lookup_names(url.toString())
+        self.injector.apply(page, names)
+        return names
+
+    def update_suggestions(self, text):
+        """ Refill the URL bar completer from history for the typed text. """
+        try:
+            suggestions = self.history.suggest(text)
+        except sqlite3.Error as e:
+            print(f"History lookup failed: {e}")
+            suggestions = []
+        self.url_model.setStringList([url for url, title in suggestions])
+        self.speculation.predict(text, suggestions)
+
+    def closeEvent(self, event):
+        self.session.save()
+        self.history.close()
+        self.background_host.stop_all()
+        super().closeEvent(event)
+
     def load_url_from_input(self):
         """ Load URL from the input bar. """
         url = self.url_bar.text()
-        if url.startswith("kkurl://ext"):
-            self.show_extension_manager()  # Load extension manager when kkurl://ext is entered
-        elif not url.startswith("http://") and not url.startswith("https://"):
+        # Internal pages (kkurl://ext, kkurl://perf) are served by KKurlSchemeHandler
+        if not url.startswith(("http://", "https://", "kkurl://")):
             url = "http://" + url
+        page = self.speculation.take(url)
+        if page is not None:
+            # The prerendered page becomes the tab's page; the view now owns it
+            old_page = self.webview.page()
+            page.setParent(self.webview)
+            self.webview.setPage(page)
+            if old_page is not page:
+                # Otherwise the replaced page and its renderer live as long as the tab
+                self.detach_page(old_page)
+                old_page.deleteLater()
+            self.tabs.set_title(self.tabs.current_tab, page.title())
+            self.update_url()
+            return
         self.webview.setUrl(QUrl(url))
 
     def show_extension_manager(self):
         """ Show the extension management UI. """
-        html_content = """
+        self.webview.setUrl(QUrl("kkurl://ext/"))
+
+    def show_perf_dashboard(self):
+        """ Show p50/p95 page load timings per origin and the latest loads. """
+        self.webview.setUrl(QUrl("kkurl://perf/"))
+
+    def perf_dashboard_html(self):
+        """ Render the kkurl://perf page. """
+        def ms(value):
+            return "-" if value is None else f"{value:.0f}"
+
+        rows = ""
+        for entry in self.perf_store.summary():
+            rows += f"""
+                <tr><td>{html.escape(entry["origin"])}</td><td>{entry["loads"]}</td>
+                <td>{ms(entry["load_p50"])}</td><td>{ms(entry["load_p95"])}</td>
+                <td>{ms(entry["ttfb_p50"])}</td><td>{ms(entry["ttfb_p95"])}</td>
+                <td>{ms(entry["fcp_p50"])}</td><td>{ms(entry["fcp_p95"])}</td></tr>"""
+
+        recent = ""
+        for ts, url, ok, load_ms, ttfb_ms, fcp_ms, resources, transfer_bytes in self.perf_store.recent():
+            recent += f"""
+                <tr><td>{time.strftime("%H:%M:%S", time.localtime(ts))}</td><td>{html.escape(url[:100])}</td>
+                <td>{"ok" if ok else "failed"}</td><td>{ms(load_ms)}</td><td>{ms(ttfb_ms)}</td><td>{ms(fcp_ms)}</td>
+                <td>{resources if resources is not None else "-"}</td><td>{(transfer_bytes or 0) // 1024}</td></tr>"""
+
+        stats = self.speculation.stats
+        hit_rate = self.speculation.hit_rate()
+        speculation = (f"{stats['prerenders']} prerenders, {stats['preconnects']} preconnects, "
+                       f"{stats['hits']} hits, {stats['misses']} misses, "
+                       f"hit rate {'-' if hit_rate is None else f'{hit_rate:.0%}'}, "
+                       f"{stats['saved_ms']:.0f} ms saved")
+
+        host = self.background_host
+        latency = host.latency_summary()
+        bridge = (f"{len(host.backgrounds)} background pages, {host.stats['messages']} messages in "
+                  f"{host.stats['batches_in']} batches received / {host.stats['batches_out']} sent, round trip "
+                  + ("-" if latency is None else f"p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms"))
+
+        html_content = f"""
         <!DOCTYPE html>
         <html lang="en">
         <head>
             <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Extension Management</title>
+            <title>Performance</title>
             <style>
-                body { font-family: Arial, sans-serif; }
-                .extension-list { margin-top: 20px; }
-                .extension { margin-bottom: 10px; }
-                .code-editor { width: 100%; height: 200px; }
+                body {{ font-family: Arial, sans-serif; }}
+                table {{ border-collapse: collapse; margin-bottom: 30px; }}
+                td, th {{ border: 1px solid #ccc; padding: 4px 8px; text-align: right; }}
+                td:first-child, th:first-child {{ text-align: left; }}
             </style>
         </head>
         <body>
-            <h1>Manage Extensions</h1>
-            <div class="extension-list">
-        """
-        
-        for ext in self.extensions:
-            html_content += f"""
-                <div class="extension">
-                    <label>{ext.name}</label>
-                    <input type="checkbox" id="checkbox_{ext.name}" onclick="toggleExtension('{ext.name}')" />
-                    <textarea id="background_{ext.name}" class="code-editor">{self.read_code(ext.background_script)}</textarea>
-                    <textarea id="content_{ext.name}" class="code-editor">{self.read_code(ext.content_script)}</textarea>
-                    <button onclick="updateCode('{ext.name}')">Save Changes</button>
-                </div>
-            """
-
-        html_content += """
-            </div>
-            <script>
-                function toggleExtension(extensionName) {
-                    // Call backend to enable/disable extension (this part would be handled in a real browser)
-                    alert(extensionName + " toggled!");
-                }
-                function updateCode(extensionName) {
-                    var backgroundCode = document.getElementById("background_" + extensionName).value;
-                    var contentCode = document.getElementById("content_" + extensionName).value;
-                    // Call backend to save code and apply changes
-                    alert("Updating " + extensionName);
-                    // Make a request to save the updated code to the server or backend
-                }
-            </script>
+            <h1>Page Load Performance (last 7 days, ms)</h1>
+            <table>
+                <tr><th>Origin</th><th>Loads</th><th>Load p50</th><th>Load p95</th>
+                <th>TTFB p50</th><th>TTFB p95</th><th>FCP p50</th><th>FCP p95</th></tr>
+                {rows}
+            </table>
+            <h2>URL bar prediction</h2>
+            <p>{speculation}</p>
+            <h2>Extension messaging</h2>
+            <p>{bridge}</p>
+            <h2>Recent loads</h2>
+            <table>
+                <tr><th>Time</th><th>URL</th><th>Status</th><th>Load</th><th>TTFB</th><th>FCP</th>
+                <th>Resources</th><th>KB</th></tr>
+                {recent}
+            </table>
         </body>
         </html>
         """
-
-        self.webview.setHtml(html_content)
-
-    def read_code(self, path):
-        """ Read and return the code from a file. """
-        if os.path.exists(path):
-            with open(path, 'r') as file:
-                return file.read()
-        return ""
+        return html_content
 
     def update_url(self):
         """ Update the URL bar after the page has loaded. """
+        if self.webview is None:
+            return
         current_url = self.webview.url().toString()
         self.url_bar.setText(current_url)
 
@@ -288,18 +2671,590 @@ document.body.style.backgroundColor = 'yellow';
         """ Refresh the page. """
         self.webview.reload()
 
+class CustomWebEnginePage(QWebEnginePage):
+    # Emitted for main frame navigations before they start loading
+    navigationRequested = pyqtSignal(QUrl)
+
+    def acceptNavigationRequest(self, url, type, isMainFrame):
+        if isMainFrame:
+            self.navigationRequested.emit(url)
+        return super().acceptNavigationRequest(url, type, isMainFrame)
+
 class CustomWebEngineView(QWebEngineView):
     def __init__(self, parent):
         super().__init__(parent)
+        self.browser = parent
+        page = parent.take_prewarmed_page()
+        if page is None:
+            page = CustomWebEnginePage(parent.profile, self)
+        else:
+            page.setParent(self)
+        self.setPage(page)
 
     def createWindow(self, type):
-        if type == QWebEnginePage.WebBrowserTab:
-            return self
-        return super().createWindow(type)
+        # Popups and new tabs get their own tab instead of replacing the current page
+        background = type == QWebEnginePage.WebBrowserBackgroundTab
+        tab = self.browser.tabs.new_tab(background=background)
+        return tab.view
 
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    browser = Browser()
-    sys.exit(app.exec_())
+def bench_match_index(pattern_count=5000, lookup_count=20000, seed=1):
+    """ Micro-benchmark URLMatchIndex lookups against pattern_count synthetic patterns. """
+    rng = random.Random(seed)
+    hosts = [f"site{i}.example{i % 50}.com" for i in range(pattern_count)]
+    index = URLMatchIndex()
+    for i in range(pattern_count):
+        host = hosts[i]
+        kind = i % 10
+        if i % 100 == 99:
+            matches = [f"*://*/*.pdf?{i}*"]
+        elif kind < 5:
+            matches = [f"*://*.{host}/*"]
+        elif kind < 8:
+            matches = [f"https://{host}/app/*/view*"]
+        else:
+            matches = [f"*://{host}/*"]
+        index.add((f"ext{i}", 0), matches, [f"*://{host}/private/*"] if kind == 1 else [])
+    index.add(("all", 0), ["<all_urls>"])
+
+    urls = []
+    for _ in range(lookup_count):
+        host = rng.choice(hosts) if rng.random() < 0.8 else f"unknown{rng.randrange(10 ** 6)}.org"
+        sub = rng.choice(["", "www.", "cdn.static."])
+        path = rng.choice(["/", "/app/42/view?x=1", "/private/a", "/docs/file.pdf?7"])
+        urls.append(f"https://{sub}{host}{path}")
+
+    start = time.perf_counter()
+    index.rebuild()
+    build_ms = (time.perf_counter() - start) * 1000
 
+    timings = []
+    matched = 0
+    for url in urls:
+        start = time.perf_counter()
+        matched += len(index.lookup(url))
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    result = {
+        "patterns": pattern_count + 1,
+        "lookups": lookup_count,
+        "build_ms": round(build_ms, 3),
+        "mean_us": round(sum(timings) / len(timings) * 1e6, 3),
+        "p50_us": round(timings[len(timings) // 2] * 1e6, 3),
+        "p99_us": round(timings[int(len(timings) * 0.99)] * 1e6, 3),
+        "matches": matched,
+    }
+    print(json.dumps(result, indent=4))
+    return result
 
+FILTER_SELF_CHECK = [
+    # (rules, url, blocked)
+    ([r"/\Wad\W/"], "https://cdn.example.com/x-ad-1.js", True),
+    ([r"/\Wad\W/"], "https://cdn.example.com/loader.js", False),
+    ([r"/banner\D+\.gif/"], "https://example.com/banner-top.gif", True),
+    ([r"/banner\D+\.gif/"], "https://example.com/banner42.gif", False),
+    ([r"/\/track\S*\.JS$/"], "https://example.com/track/pixel.js", True),
+    (["||ads.example.com^"], "https://ads.example.com/a.js", True),
+    (["||ads.example.com^", "@@||ads.example.com/ok/*"], "https://ads.example.com/ok/a.js", False),
+    (["/Banner/ad.GIF"], "https://example.com/banner/ad.gif", True),
+]
+
+def check_filter_engine():
+    """ Check a few known rules against the engine, so compile regressions fail the benchmark. """
+    for rules, url, expected in FILTER_SELF_CHECK:
+        engine = FilterEngine()
+        for rule in rules:
+            engine.add_rule(rule)
+        if engine.should_block(url, urlsplit(url).hostname or "") != expected:
+            raise AssertionError(f"filter self-check failed: {rules} on {url} should {'' if expected else 'not '}block")
+
+def bench_filter_engine(rules_path, corpus_path, repeat=1):
+    """ Benchmark FilterEngine.should_block against a recorded URL corpus.
+
+    The corpus has one request per line: "URL [FIRST_PARTY_URL [TYPE]]".
+    """
+    check_filter_engine()
+    start = time.perf_counter()
+    engine = FilterEngine().load_file(rules_path)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    requests = []
+    with open(corpus_path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            url = fields[0]
+            first_party = (urlsplit(fields[1]).hostname or "") if len(fields) > 1 else ""
+            requests.append((url, urlsplit(url).hostname or "", first_party, fields[2] if len(fields) > 2 else None))
+
+    timings = []
+    blocked = 0
+    for _ in range(repeat):
+        for url, host, first_party, resource_type in requests:
+            start = time.perf_counter()
+            blocked += engine.should_block(url, host, first_party, resource_type)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    result = {
+        "rules": engine.rule_count,
+        "skipped_rules": engine.skipped,
+        "load_ms": round(load_ms, 3),
+        "requests": len(timings),
+        "blocked": blocked,
+        "mean_us": round(sum(timings) / max(len(timings), 1) * 1e6, 3),
+        "p50_us": round(timings[len(timings) // 2] * 1e6, 3) if timings else 0,
+        "p99_us": round(timings[int(len(timings) * 0.99)] * 1e6, 3) if timings else 0,
+    }
+    print(json.dumps(result, indent=4))
+    return result
+
+class FixtureServer:
+    """ Local HTTP server with synthetic pages, so page-load benchmarks need no network.
+
+    /small.html, /medium.html and /large.html reference that many scripts, stylesheets
+    and images under /asset/. Assets are cacheable and are served after asset_delay_ms,
+    so cold and warm cache loads differ the way they do on a real network.
+    """
+    PAGES = {"small": 6, "medium": 30, "large": 120}
+
+    def __init__(self, port=0, asset_delay_ms=20):
+        self.asset_delay_ms = asset_delay_ms
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self.make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def urls(self):
+        return [f"http://127.0.0.1:{self.port}/{name}.html" for name in self.PAGES]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    @classmethod
+    def page(cls, name):
+        count = cls.PAGES[name]
+        parts = [f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{name} fixture</title>"]
+        parts += [f"<link rel='stylesheet' href='/asset/style-{i}.css'>" for i in range(count // 3)]
+        parts += [f"<script src='/asset/script-{i}.js'></script>" for i in range(count // 3)]
+        parts.append(f"</head><body><h1>{name} fixture</h1>")
+        parts += [f"<p>Paragraph {i}: " + "lorem ipsum dolor sit amet " * 20 + "</p>" for i in range(count)]
+        parts += [f"<img src='/asset/image-{i}.svg' width='64' height='64'>" for i in range(count - 2 * (count // 3))]
+        parts.append("</body></html>")
+        return "".join(parts).encode()
+
+    @staticmethod
+    def asset(filename):
+        stem, _, ext = filename.rpartition(".")
+        padding = "/* " + "x" * 2048 + " */\n"
+        if ext == "js":
+            return "application/javascript", (padding + f"window.fixtureScripts = (window.fixtureScripts || 0) + 1; // {stem}\n").encode()
+        if ext == "css":
+            return "text/css", (padding + f".{stem} {{ color: #123456; }}\n").encode()
+        if ext == "svg":
+            return "image/svg+xml", (f"<svg xmlns='http://www.w3.org/2000/svg' width='64' height='64'>"
+                                     f"<rect width='64' height='64' fill='#{zlib.crc32(stem.encode()) & 0xffffff:06x}'/></svg>").encode()
+        return None, None
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                name = path.strip("/").rpartition(".")[0]
+                if name in server.PAGES:
+                    self.respond(200, "text/html; charset=utf-8", server.page(name), "no-cache")
+                elif path.startswith("/asset/"):
+                    content_type, body = server.asset(path[len("/asset/"):])
+                    if body is None:
+                        self.respond(404, "text/plain", b"not found", "no-store")
+                        return
+                    time.sleep(server.asset_delay_ms / 1000)
+                    self.respond(200, content_type, body, "public, max-age=86400")
+                else:
+                    self.respond(404, "text/plain", b"not found", "no-store")
+
+            def respond(self, status, content_type, body, cache_control):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", cache_control)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def wait_for_signal(signal, timeout):
+    """ Run a local event loop until signal fires or timeout (s) passes. Returns the signal args or None. """
+    loop = QEventLoop()
+    result = []
+
+    def done(*args):
+        result.append(args)
+        loop.quit()
+    signal.connect(done)
+    QTimer.singleShot(int(timeout * 1000), loop.quit)
+    loop.exec_()
+    signal.disconnect(done)
+    return result[0] if result else None
+
+class PageLoadBenchmark:
+    """ Loads URLs in a Browser with a cold and then a warm HTTP cache and reports the timings. """
+    def __init__(self, browser, timeout=30):
+        self.browser = browser
+        self.timeout = timeout
+
+    def enable_extensions(self):
+        if self.browser.scanner is not None:
+            wait_for_signal(self.browser.scanner.finished, self.timeout)
+        for extension in self.browser.extensions.values():
+            extension.enable(self.browser)
+        return len(self.browser.extensions)
+
+    def memory_mb(self):
+        page = self.browser.webview.page()
+        pids = {os.getpid()}
+        if hasattr(page, "renderProcessPid") and page.renderProcessPid() > 0:
+            pids.add(page.renderProcessPid())
+        used = [process_memory_mb(pid) for pid in pids]
+        return None if None in used else sum(used)
+
+    def blank(self):
+        self.browser.webview.setUrl(QUrl("about:blank"))
+        wait_for_signal(self.browser.webview.loadFinished, self.timeout)
+
+    def load(self, url):
+        self.blank()
+        before = self.memory_mb()
+        self.browser.webview.setUrl(QUrl(url))
+        record = wait_for_signal(self.browser.perf.recorded, self.timeout)
+        after = self.memory_mb()
+        if record is None:
+            return {"ok": False, "error": "timeout"}
+        record = record[0]
+        return {
+            "ok": record["ok"],
+            "load_ms": round(record["load_ms"], 2),
+            "ttfb_ms": record.get("ttfb_ms"),
+            "fcp_ms": record.get("fcp_ms"),
+            "resources": record.get("resources"),
+            "transfer_bytes": record.get("transfer_bytes"),
+            "memory_delta_mb": round(after - before, 2) if before is not None and after is not None else None,
+        }
+
+    def run(self, urls, repeat):
+        results = []
+        for url in urls:
+            self.browser.profile.clearHttpCache()
+            # clearHttpCache() works asynchronously; give it a moment before the cold load
+            loop = QEventLoop()
+            QTimer.singleShot(500, loop.quit)
+            loop.exec_()
+            cold = self.load(url)
+            warm = [self.load(url) for _ in range(repeat)]
+            warm_times = sorted(run["load_ms"] for run in warm if run.get("ok"))
+            results.append({
+                "url": url,
+                "cold": cold,
+                "warm": warm,
+                "warm_p50_ms": percentile(warm_times, 50),
+            })
+            print(f"{url}: cold {cold.get('load_ms')} ms, warm p50 {percentile(warm_times, 50)} ms", file=sys.stderr)
+        return results
+
+def run_page_load_benchmark(argv):
+    """ KKURL.py --bench URLS|fixtures [--repeat N] [--offscreen] [--with-extensions] [--output FILE] """
+    parser = argparse.ArgumentParser(description="KKURL page load benchmark")
+    parser.add_argument("--bench", metavar="URLS", required=True, help='file with one URL per line, or "fixtures"')
+    parser.add_argument("--repeat", type=int, default=3, help="warm cache loads per URL")
+    parser.add_argument("--offscreen", action="store_true", help="use the Qt offscreen platform")
+    parser.add_argument("--with-extensions", action="store_true", help="enable all installed extensions")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for one load")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args, rest = parser.parse_known_args(argv[1:])
+    if args.offscreen:
+        os.environ["QT_QPA_PLATFORM"] = "offscreen"
+
+    server = None
+    if args.bench == "fixtures":
+        server = FixtureServer().start()
+        urls = server.urls()
+    else:
+        with open(args.bench, "r") as f:
+            urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    # A throwaway on-disk profile so the first load really is a cold cache load
+    profile_dir = tempfile.mkdtemp(prefix="kkurl-bench-")
+    config, qt_argv = parse_args(argv[:1] + rest)
+    config.update({"profile": "bench", "profile_dir": profile_dir, "off_the_record": False,
+                   "cache_type": "disk", "home_url": "about:blank",
+                   "restore_session": False})
+
+    register_kkurl_scheme()
+    app = QApplication(qt_argv)
+    browser = Browser(config)
+    try:
+        bench = PageLoadBenchmark(browser, args.timeout)
+        extensions = bench.enable_extensions() if args.with_extensions else 0
+        report = {
+            "offscreen": args.offscreen,
+            "extensions_enabled": extensions,
+            "repeat": args.repeat,
+            "results": bench.run(urls, args.repeat),
+        }
+    finally:
+        browser.close()
+        # Let the closed browser's deferred deletes run before its profile directory goes away
+        app.processEvents()
+        if server is not None:
+            server.stop()
+        shutil.rmtree(profile_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return report
+
+def run_startup_benchmark(argv):
+    """ KKURL.py --bench-startup [--runs N] [--script FILE] [--output FILE]
+
+    Launches the browser offscreen with --startup-trace --quit-after-startup, eagerly and in
+    fast start mode (with and without --prewarm). Every run gets a fresh home directory for a
+    cold start and then starts again on the profile that left behind for a warm one. The
+    home page comes from a FixtureServer, so no run depends on the network.
+    """
+    parser = argparse.ArgumentParser(description="KKURL startup benchmark")
+    parser.add_argument("--bench-startup", action="store_true", required=True)
+    parser.add_argument("--runs", type=int, default=5, help="cold/warm start pairs per mode")
+    parser.add_argument("--script", default=os.path.abspath(__file__), help="browser script to start (KKURL.py or kkurlv2-aero0.py)")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds one start may take")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv[1:])
+
+    own_script = os.path.abspath(args.script) == os.path.abspath(__file__)
+    modes = {"eager": [], "fast": ["--fast-start"]}
+    if own_script:
+        modes["fast+prewarm"] = ["--fast-start", "--prewarm"]
+    server = FixtureServer().start()
+
+    def start(home, flags):
+        env = dict(os.environ, QT_QPA_PLATFORM="offscreen", HOME=home, USERPROFILE=home,
+                   LOCALAPPDATA=os.path.join(home, "AppData", "Local"))
+        env.pop("XDG_DATA_HOME", None)
+        env.pop("XDG_CACHE_HOME", None)
+        trace_path = os.path.join(home, "startup-trace.json")
+        command = [sys.executable, args.script, "--startup-trace", trace_path, "--quit-after-startup"] + flags
+        if own_script:
+            config_path = os.path.join(home, "bench-config.json")
+            with open(config_path, "w") as f:
+                json.dump({"home_url": server.urls()[0]}, f)
+            command += ["--config", config_path]
+        started = time.perf_counter()
+        try:
+            subprocess.run(command, cwd=home, env=env, timeout=args.timeout,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            with open(trace_path, "r") as f:
+                report = json.load(f)
+        except (subprocess.TimeoutExpired, OSError, ValueError) as e:
+            return {"ok": False, "error": str(e)}
+        os.remove(trace_path)
+        report["ok"] = True
+        report["process_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return report
+
+    results = {}
+    try:
+        for mode, flags in modes.items():
+            runs = {"cold": [], "warm": []}
+            for _ in range(args.runs):
+                home = tempfile.mkdtemp(prefix="kkurl-startup-")
+                try:
+                    runs["cold"].append(start(home, flags))
+                    runs["warm"].append(start(home, flags))
+                finally:
+                    shutil.rmtree(home, ignore_errors=True)
+            summary = {}
+            for kind, reports in runs.items():
+                ok = [report for report in reports if report["ok"]]
+                summary[kind] = {
+                    key + "_p50": percentile(sorted(report[key] for report in ok if report.get(key) is not None), 50)
+                    for key in ("first_paint_ms", "ready_ms", "process_ms")
+                }
+                summary[kind]["failed"] = len(reports) - len(ok)
+                print(f"{mode} {kind}: {summary[kind]}", file=sys.stderr)
+            results[mode] = {"summary": summary, "runs": runs}
+    finally:
+        server.stop()
+
+    output = json.dumps({"script": os.path.basename(args.script), "runs": args.runs, "results": results}, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return results
+
+def bench_history(rows=1000000, queries=2000, seed=1):
+    """ Fill a temporary history with rows synthetic URLs and time suggest() for typed prefixes. """
+    rng = random.Random(seed)
+    words = ["news", "mail", "docs", "video", "shop", "cloud", "forum", "wiki", "bank", "maps", "photos",
+             "music", "game", "sport", "travel", "code", "blog", "weather", "jobs", "recipes"]
+    sites = [f"{rng.choice(words)}{i}.{rng.choice(['com', 'org', 'net', 'io'])}" for i in range(max(rows // 50, 1))]
+    tmp_dir = tempfile.mkdtemp(prefix="kkurl-history-")
+    try:
+        store = HistoryStore(os.path.join(tmp_dir, "history.sqlite"))
+        start = time.perf_counter()
+        now = time.time()
+        batch = []
+        with store.db:
+            for i in range(rows):
+                site = sites[int(rng.paretovariate(1.2)) % len(sites)]
+                url = f"https://{site}/{rng.choice(words)}/{i}"
+                visits = int(rng.paretovariate(1.5))
+                last_visit = now - rng.random() * 365 * 86400
+                batch.append((url, f"{rng.choice(words).title()} {rng.choice(words)} {i}", visits, last_visit,
+                              HistoryStore.frecency(visits, last_visit)))
+                if len(batch) == 10000:
+                    store.db.executemany("INSERT INTO urls(url, title, visit_count, last_visit, frecency) VALUES (?,?,?,?,?)", batch)
+                    batch = []
+            if batch:
+                store.db.executemany("INSERT INTO urls(url, title, visit_count, last_visit, frecency) VALUES (?,?,?,?,?)", batch)
+        fill_s = time.perf_counter() - start
+
+        typed = []
+        for _ in range(queries):
+            word = rng.choice(words + sites)
+            typed.append(word[:rng.randint(1, len(word))])
+        timings = []
+        for text in typed:
+            start = time.perf_counter()
+            store.suggest(text)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        store.close()
+        result = {
+            "rows": rows,
+            "fill_s": round(fill_s, 2),
+            "queries": len(timings),
+            "mean_ms": round(sum(timings) / len(timings), 3),
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+            "max_ms": round(timings[-1], 3),
+        }
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print(json.dumps(result, indent=4))
+    return result
+
+def bench_bridge(count=1000, burst=100, timeout=30):
+    """ Time Python -> background page -> Python round trips through the extension bridge. """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication(sys.argv[:1])
+    profile = QWebEngineProfile(app)
+    host = BackgroundHost(profile, ScriptCache(), app)
+    tmp_dir = tempfile.mkdtemp(prefix="kkurl-bridge-")
+    try:
+        with open(os.path.join(tmp_dir, "background.js"), "w") as f:
+            f.write("kkurl.runtime.onMessage.addListener(function(message, sender, reply) { reply(message); });")
+        extension = Extension("echo", tmp_dir, {"name": "echo"})
+        host.start(extension)
+        if wait_for_signal(host.backgroundReady, timeout) is None:
+            print("Background page did not start")
+            return None
+
+        # One message in flight at a time: the plain round-trip latency
+        for i in range(count):
+            loop = QEventLoop()
+            host.send("echo", i, lambda reply, loop=loop: loop.quit())
+            QTimer.singleShot(int(timeout * 1000), loop.quit)
+            loop.exec_()
+        sequential = host.latency_summary()
+
+        # A burst sent in one tick travels as a few batches instead of one call per message
+        host.latencies.clear()
+        batches = host.stats["batches_out"]
+        replies = []
+        loop = QEventLoop()
+        start = time.perf_counter()
+        for i in range(burst):
+            host.send("echo", i, lambda reply: (replies.append(reply), loop.quit() if len(replies) == burst else None))
+        QTimer.singleShot(int(timeout * 1000), loop.quit)
+        loop.exec_()
+        result = {
+            "round_trips": sequential,
+            "burst": {
+                "messages": burst,
+                "replies": len(replies),
+                "batches_sent": host.stats["batches_out"] - batches,
+                "total_ms": round((time.perf_counter() - start) * 1000, 3),
+                "latency": host.latency_summary(),
+            },
+        }
+        host.stop_all()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    print(json.dumps(result, indent=4))
+    return result
+
+if __name__ == "__main__":
+    if "--bench-match" in sys.argv:
+        # Usage: KKURL.py --bench-match [PATTERNS]
+        args = sys.argv[sys.argv.index("--bench-match") + 1:]
+        bench_match_index(int(args[0]) if args else 5000)
+        sys.exit(0)
+    if "--bench-filter" in sys.argv:
+        # Usage: KKURL.py --bench-filter RULES.txt URLS.txt [REPEAT]
+        args = sys.argv[sys.argv.index("--bench-filter") + 1:]
+        bench_filter_engine(args[0], args[1], int(args[2]) if len(args) > 2 else 1)
+        sys.exit(0)
+    if "--bench-history" in sys.argv:
+        # Usage: KKURL.py --bench-history [ROWS]
+        args = sys.argv[sys.argv.index("--bench-history") + 1:]
+        bench_history(int(args[0]) if args else 1000000)
+        sys.exit(0)
+    if "--bench-bridge" in sys.argv:
+        # Usage: KKURL.py --bench-bridge [ROUND_TRIPS]
+        args = sys.argv[sys.argv.index("--bench-bridge") + 1:]
+        bench_bridge(int(args[0]) if args else 1000)
+        sys.exit(0)
+    if "--bench" in sys.argv:
+        run_page_load_benchmark(sys.argv)
+        sys.exit(0)
+    if "--bench-startup" in sys.argv:
+        run_startup_benchmark(sys.argv)
+        sys.exit(0)
+    if "--serve-fixtures" in sys.argv:
+        # Usage: KKURL.py --serve-fixtures [PORT]
+        args = sys.argv[sys.argv.index("--serve-fixtures") + 1:]
+        server = FixtureServer(int(args[0]) if args else 8808)
+        print("Serving fixtures:", " ".join(server.urls()))
+        server.httpd.serve_forever()
+
+    trace = StartupTrace()
+    trace.mark("imports")
+    config, qt_argv = parse_args(sys.argv)
+    register_kkurl_scheme()
+    app = QApplication(qt_argv)
+    trace.mark("qapplication")
+    if config["startup_trace"]:
+        trace.finished.connect(lambda report: write_startup_trace(config["startup_trace"], report))
+    browser = Browser(config, trace)
+    if config["quit_after_startup"]:
+        trace.finished.connect(lambda report: QTimer.singleShot(0, browser.close))
+    sys.exit(app.exec_())
@@ -1,15 +1,64 @@
+import time
+# --startup-trace counts from here, so the Qt imports below are part of the trace
+PROCESS_STARTED = time.perf_counter()
 import sys
 import os
 import json
+from collections import OrderedDict
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QWidget,
     QLineEdit, QHBoxLayout, QPushButton, QDockWidget,
     QListWidget, QCheckBox, QListWidgetItem, QInputDialog
 )
-from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineProfile, QWebEnginePage
-from PyQt5.QtCore import QUrl
+from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineProfile, QWebEnginePage, QWebEngineScript
+from PyQt5.QtCore import QUrl, QTimer, QObject, pyqtSignal
 from PyQt5.QtGui import QIcon
 
+# Startup phase timing for --startup-trace
+class StartupTrace(QObject):
+    """ mark(phase) closes a phase that started at the previous mark; finished carries the report. """
+    finished = pyqtSignal(dict)
+
+    def __init__(self, started=PROCESS_STARTED, parent=None):
+        super().__init__(parent)
+        self.started = self.last = started
+        self.phases = OrderedDict()
+        self.at = {}
+        self.done = False
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] = round((now - self.last) * 1000, 2)
+        self.at[phase] = round((now - self.started) * 1000, 2)
+        self.last = now
+
+    def report(self):
+        return {
+            "phases_ms": dict(self.phases),
+            "first_paint_ms": self.at.get("first_paint"),
+            "ready_ms": round((self.last - self.started) * 1000, 2),
+        }
+
+    def finish(self):
+        if not self.done:
+            self.done = True
+            self.finished.emit(self.report())
+
+def write_startup_trace(path, report):
+    output = json.dumps(report, indent=4)
+    if path == "-":
+        print(output)
+    else:
+        with open(path, "w") as f:
+            f.write(output)
+
+HOME_URL = "https://google.com"
+# Shown first with --fast-start, before anything touches the network
+START_PAGE_HTML = """
+<!DOCTYPE html><html lang="en"><head><meta charset="UTF-8"><title>New Tab</title></head>
+<body style="background-color: black;"><h1 style="color: #00ff99; font-family: 'Courier New', monospace;">KKURL</h1></body></html>
+"""
+
 # Custom WebEngineView to set USER AGENT
 class CustomWebEngineView(QWebEngineView):
     def __init__(self, parent=None):
@@ -24,6 +73,66 @@ class CustomWebEngineView(QWebEngineView):
             return self
         return super().createWindow(type)
 
+# Extension Script Cache + Injection
+class ScriptCache:
+    """ In-memory cache of extension script sources, keyed by path and mtime. """
+    def __init__(self):
+        self.entries = {}
+
+    def read(self, path):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            self.entries.pop(path, None)
+            return None
+        entry = self.entries.get(path)
+        if entry is None or entry[0] != mtime:
+            with open(path, "r") as script_file:
+                entry = (mtime, script_file.read())
+            self.entries[path] = entry
+        return entry[1]
+
+class ScriptInjector:
+    """ Registers extension scripts once as QWebEngineScripts so they run on every navigation. """
+    RUN_AT = {
+        "document_start": QWebEngineScript.DocumentCreation,
+        "document_end": QWebEngineScript.DocumentReady,
+        "document_idle": QWebEngineScript.Deferred,
+    }
+
+    def __init__(self, profile, cache):
+        self.collection = profile.scripts()
+        self.cache = cache
+        self.registered = {}
+
+    def register(self, extension):
+        self.unregister(extension)
+        content_scripts = extension.manifest.get("content_scripts") or [{}]
+        run_at = content_scripts[0].get("run_at", "document_idle")
+        specs = [
+            ("background", extension.background_script, QWebEngineScript.DocumentCreation),
+            ("content", extension.content_script, self.RUN_AT.get(run_at, QWebEngineScript.Deferred)),
+        ]
+        scripts = []
+        for kind, path, injection_point in specs:
+            source = self.cache.read(path)
+            if source is None:
+                continue
+            script = QWebEngineScript()
+            script.setName(f"kkurl-ext:{extension.name}:{kind}")
+            script.setSourceCode(source)
+            script.setInjectionPoint(injection_point)
+            script.setWorldId(QWebEngineScript.ApplicationWorld)
+            script.setRunsOnSubFrames(False)
+            self.collection.insert(script)
+            scripts.append(script)
+        self.registered[extension.name] = scripts
+        return scripts
+
+    def unregister(self, extension):
+        for script in self.registered.pop(extension.name, []):
+            self.collection.remove(script)
+
 # Extension Management Class
 class Extension:
     def __init__(self, name, path, manifest):
@@ -31,23 +140,22 @@ class Extension:
         self.path = path
         self.manifest = manifest
         self.enabled = False
+        self.injector = None
         self.background_script = os.path.join(self.path, "background.js")
         self.content_script = os.path.join(self.path, "content.js")
 
     def enable(self, browser):
         if not self.enabled:
-            if os.path.exists(self.background_script):
-                with open(self.background_script, "r") as script_file:
-                    background_script = script_file.read()
-                browser.webview.page().runJavaScript(background_script)
-            if os.path.exists(self.content_script):
-                with open(self.content_script, "r") as script_file:
-                    content_script = script_file.read()
-                browser.webview.page().runJavaScript(content_script)
+            self.injector = browser.injector
+            # Registered scripts apply from the next navigation; run them once in the open page too
+            for script in self.injector.register(self):
+                browser.webview.page().runJavaScript(script.sourceCode(), QWebEngineScript.ApplicationWorld)
             self.enabled = True
             print(f"Enabled extension: {self.name}")
 
     def disable(self, browser):
+        if self.enabled:
+            browser.injector.unregister(self)
         self.enabled = False
         print(f"Disabled extension: {self.name}")
 
@@ -56,22 +164,36 @@ class Extension:
             f.write(background_code)
         with open(self.content_script, 'w') as f:
             f.write(content_code)
+        if self.enabled and self.injector is not None:
+            self.injector.register(self)
         print(f"Updated extension {self.name} with new code.")
 
 # Main Browser Class
 class Browser(QMainWindow):
-    def __init__(self):
+    FIRST_PAINT_TIMEOUT = 1000
+
+    def __init__(self, fast_start=False, trace=None):
         super().__init__()
+        self.trace = trace or StartupTrace()
+        # Fast start: window and a local start page first, navigation and extensions after the first paint
+        self.fast_start = fast_start
+        self.painted = False
         self.setWindowTitle("KKURL BROWSER")
         self.setGeometry(100, 100, 1200, 800)
 
-        self.cache_folder = os.path.join(os.getenv("USERPROFILE"), "Documents", "QtWebEngine", "Cache")
+        # USERPROFILE only exists on Windows; fall back to the home dir elsewhere
+        home = os.getenv("USERPROFILE") or os.path.expanduser("~")
+        self.cache_folder = os.path.join(home, "Documents", "QtWebEngine", "Cache")
         if not os.path.exists(self.cache_folder):
             os.makedirs(self.cache_folder)
 
         profile = QWebEngineProfile.defaultProfile()
         profile.setCachePath(self.cache_folder)
 
+        self.script_cache = ScriptCache()
+        self.injector = ScriptInjector(profile, self.script_cache)
+        self.trace.mark("profile")
+
         self.main_widget = QWidget(self)
         self.main_layout = QVBoxLayout(self.main_widget)
 
@@ -101,7 +223,10 @@ class Browser(QMainWindow):
 
         # WebView
         self.webview = CustomWebEngineView(self)
-        self.webview.setUrl(QUrl("https://google.com"))
+        if self.fast_start:
+            self.webview.setHtml(START_PAGE_HTML)
+        else:
+            self.webview.setUrl(QUrl(HOME_URL))
         self.webview.loadFinished.connect(self.update_url)
         self.main_layout.addWidget(self.webview)
 
@@ -147,19 +272,15 @@ class Browser(QMainWindow):
             font-family: 'Courier New', monospace;
         }
         """)
-
-        # Extension Manager
-        self.extension_manager = QDockWidget("Extensions", self)
-        self.extension_list = QListWidget(self)
-        self.extension_manager.setWidget(self.extension_list)
-        self.addDockWidget(1, self.extension_manager)
-        self.setDockOptions(QMainWindow.AllowNestedDocks)
+        self.trace.mark("ui")
 
         self.extensions_dir = os.path.join(os.getcwd(), "extensions")
-        if not os.path.exists(self.extensions_dir):
-            os.makedirs(self.extensions_dir)
-
-        self.load_extensions()
+        self.extensions = []
+        # Created empty here, so Add Extension works before fast start builds the dock around it
+        self.extension_list = QListWidget()
+        if not self.fast_start:
+            self.build_extension_manager()
+            self.trace.mark("extensions")
 
         # Add Extension Button
         self.add_extension_button = QPushButton("Add Extension", self)
@@ -172,6 +293,47 @@ class Browser(QMainWindow):
         self.main_layout.addWidget(self.extension_manager_button)
 
         self.show()
+        self.trace.mark("show")
+        if self.fast_start:
+            QTimer.singleShot(self.FIRST_PAINT_TIMEOUT, self.first_painted)
+
+    def build_extension_manager(self):
+        # Extension Manager
+        self.extension_manager = QDockWidget("Extensions", self)
+        self.extension_manager.setWidget(self.extension_list)
+        self.addDockWidget(1, self.extension_manager)
+        self.setDockOptions(QMainWindow.AllowNestedDocks)
+
+        if not os.path.exists(self.extensions_dir):
+            os.makedirs(self.extensions_dir)
+
+        self.load_extensions()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.painted:
+            QTimer.singleShot(0, self.first_painted)
+
+    def first_painted(self):
+        if self.painted:
+            return
+        self.painted = True
+        self.trace.mark("first_paint")
+        if not self.fast_start:
+            self.trace.finish()
+            return
+
+        # The rest of startup, one step per event loop turn
+        def navigate():
+            self.webview.setUrl(QUrl(HOME_URL))
+            self.trace.mark("navigate")
+            QTimer.singleShot(0, extensions)
+
+        def extensions():
+            self.build_extension_manager()
+            self.trace.mark("extensions")
+            self.trace.finish()
+        QTimer.singleShot(0, navigate)
 
     def load_extensions(self):
         self.extensions = []
@@ -267,6 +429,24 @@ class Browser(QMainWindow):
         self.webview.reload()
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    browser = Browser()
+    # Usage: kkurlv2-aero0.py [--fast-start] [--startup-trace [FILE]] [--quit-after-startup]
+    trace = StartupTrace()
+    trace.mark("imports")
+    argv = list(sys.argv)
+    fast_start = "--fast-start" in argv
+    quit_after_startup = "--quit-after-startup" in argv
+    trace_path = None
+    if "--startup-trace" in argv:
+        index = argv.index("--startup-trace")
+        value = argv[index + 1] if index + 1 < len(argv) and not argv[index + 1].startswith("--") else None
+        trace_path = value or "-"
+        del argv[index:index + (2 if value else 1)]
+    argv = [arg for arg in argv if arg not in ("--fast-start", "--quit-after-startup")]
+    app = QApplication(argv)
+    trace.mark("qapplication")
+    if trace_path:
+        trace.finished.connect(lambda report: write_startup_trace(trace_path, report))
+    browser = Browser(fast_start, trace)
+    if quit_after_startup:
+        trace.finished.connect(lambda report: QTimer.singleShot(0, browser.close))
     sys.exit(app.exec_())